@@ -1,10 +1,14 @@
 import os
 import logging
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from database import engine_options
+from middleware import CachePolicyMiddleware, CompressionMiddleware
+
 
 class Base(DeclarativeBase):
     pass
@@ -12,53 +16,130 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
-# create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# configure the database
-database_url = os.environ.get("DATABASE_URL")
-if not database_url or database_url.strip() == "":
-    database_url = "sqlite:///furnitech.db"
-elif database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Upload configuration
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size - reduced for better performance
-
-# Enable debug logging
-logging.basicConfig(level=logging.DEBUG)
-
-# initialize the app with the extension
-db.init_app(app)
-
-# Import routes after app initialization
-from routes import *
-
-with app.app_context():
-    # Make sure to import the models here or their tables won't be created
-    import models
-    db.create_all()
-    
-    # Create default admin user if doesn't exist
-    from models import Admin
-    from werkzeug.security import generate_password_hash
-    
-    if not Admin.query.first():
-        admin = Admin(
-            username='admin',
-            password_hash=generate_password_hash('admin123')
-        )
-        db.session.add(admin)
-        db.session.commit()
-        print("Default admin created - username: admin, password: admin123")
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+
+def create_app(config=None):
+    """Build the application.
+
+    Nothing here touches the database, so workers (or a preloading gunicorn
+    master) start quickly. Creating the schema and seed rows is a separate,
+    one-time step: ``flask --app main bootstrap``.
+    """
+    # Runtime state (cache versions, queues, metrics, the generated secret) lives in the
+    # instance folder; INSTANCE_PATH (absolute) moves it, e.g. for benchmarks
+    app = Flask(__name__, instance_path=os.environ.get('INSTANCE_PATH') or None)
+    # PROXY_X_FOR: how many proxies in front of the app append to X-Forwarded-For. The
+    # default 0 keeps the socket address, so a client reaching gunicorn directly cannot
+    # choose its own rate-limit key
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ.get('PROXY_X_FOR', 0)), x_proto=1, x_host=1)
+    # Cache-Control per route class, then gzip/brotli for text bodies over COMPRESS_MIN_SIZE bytes
+    app.wsgi_app = CachePolicyMiddleware(app.wsgi_app)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                         min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+                                         level=int(os.environ.get('COMPRESS_LEVEL', 6)))
+
+    # configure the database
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url or database_url.strip() == "":
+        database_url = "sqlite:///furnitech.db"
+    elif database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
+
+    # Upload configuration
+    app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size - reduced for better performance
+
+    # Upload storage: 'local' (the static folder, or STORAGE_LOCAL_ROOT) or 's3' (any
+    # S3-compatible endpoint). Uploads are linked from STORAGE_PUBLIC_URL (a CDN or public
+    # bucket) when set; otherwise /media/ hands them to nginx (STORAGE_ACCEL_PREFIX), to
+    # X-Sendfile (USE_X_SENDFILE=1) or to a presigned S3 URL
+    app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'local')
+    app.config['STORAGE_LOCAL_ROOT'] = os.environ.get('STORAGE_LOCAL_ROOT')
+    app.config['STORAGE_PUBLIC_URL'] = os.environ.get('STORAGE_PUBLIC_URL')
+    app.config['STORAGE_ACCEL_PREFIX'] = os.environ.get('STORAGE_ACCEL_PREFIX')
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.config['STORAGE_S3_BUCKET'] = os.environ.get('STORAGE_S3_BUCKET')
+    app.config['STORAGE_S3_PREFIX'] = os.environ.get('STORAGE_S3_PREFIX', '')
+    app.config['STORAGE_S3_ENDPOINT'] = os.environ.get('STORAGE_S3_ENDPOINT')
+    app.config['STORAGE_S3_REGION'] = os.environ.get('STORAGE_S3_REGION')
+    app.config['STORAGE_URL_EXPIRY'] = int(os.environ.get('STORAGE_URL_EXPIRY', 3600))
+    # gc-uploads and release() keep unreferenced files saved or reused more recently
+    # than this (seconds)
+    app.config['UPLOAD_GC_MIN_AGE'] = int(os.environ.get('UPLOAD_GC_MIN_AGE', 3600))
+
+    # build-assets keeps superseded fingerprinted files this long (seconds); pages
+    # rendered before a deploy keep linking them
+    app.config['ASSET_MAX_AGE'] = int(os.environ.get('ASSET_MAX_AGE', 7 * 24 * 3600))
+
+    # Cache configuration: how long cached settings/content live, and how often
+    # a worker checks whether another worker has invalidated them
+    app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+    app.config['CACHE_VERSION_CHECK_INTERVAL'] = float(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 2))
+
+    # Contact form ingestion: per-IP/per-phone rate limit and background flushing
+    app.config['CONTACT_RATE_PER_MINUTE'] = float(os.environ.get('CONTACT_RATE_PER_MINUTE', 2))
+    app.config['CONTACT_RATE_BURST'] = int(os.environ.get('CONTACT_RATE_BURST', 5))
+    app.config['CONTACT_FLUSH_INTERVAL'] = float(os.environ.get('CONTACT_FLUSH_INTERVAL', 1))
+    app.config['CONTACT_FLUSH_BATCH'] = int(os.environ.get('CONTACT_FLUSH_BATCH', 500))
+
+    # Request instrumentation: requests slower than this are logged with their queries
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # Sessions: 'memory' (one process) or 'redis' (any Redis-protocol server, shared by
+    # every worker and node) keep the data server-side; 'cookie' keeps Flask's signed
+    # cookie and is the default without SESSION_REDIS_URL. Sessions expire after
+    # SESSION_IDLE_TIMEOUT seconds without a request
+    app.config['SESSION_REDIS_URL'] = os.environ.get('SESSION_REDIS_URL')
+    app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND',
+                                                   'redis' if app.config['SESSION_REDIS_URL'] else 'cookie')
+    app.config['SESSION_IDLE_TIMEOUT'] = int(os.environ.get('SESSION_IDLE_TIMEOUT', 8 * 3600))
+    app.config['SESSION_MAX_ENTRIES'] = int(os.environ.get('SESSION_MAX_ENTRIES', 10000))
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+
+    # Debug mode (auto-reloading templates, the interactive debugger) only with FLASK_DEBUG=1;
+    # otherwise compiled templates are cached on disk and shared by all workers
+    # (the cache has to be configured before anything touches app.jinja_env)
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    if not debug:
+        jinja_cache_dir = os.environ.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(jinja_cache_dir, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(jinja_cache_dir)}
+    app.config['TEMPLATES_AUTO_RELOAD'] = debug
+    app.debug = debug
+    app.config['TEMPLATE_WARMUP'] = os.environ.get('TEMPLATE_WARMUP', '1') == '1'
+
+    # Logging level (DEBUG is very noisy under load; set LOG_LEVEL=DEBUG when needed)
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    app.config.update(config or {})
+
+    # initialize the app with the extension
+    db.init_app(app)
+
+    # Views, request hooks, template helpers and CLI commands are blueprints;
+    # they import ``db`` from this module, hence the late import
+    import assets
+    import bootstrap
+    import images
+    import ingest
+    import metrics
+    import routes
+    import sessions
+    import storage
+    import templating
+    import uploads
+
+    app.secret_key = app.secret_key or sessions.secret_key(app.instance_path)
+    app.permanent_session_lifetime = app.config['SESSION_IDLE_TIMEOUT']
+    app.session_interface = sessions.session_interface(app)
+
+    app.register_blueprint(routes.public)
+    app.register_blueprint(routes.admin)
+    for module in (assets, bootstrap, images, ingest, metrics, storage, templating, uploads):
+        app.register_blueprint(module.bp)
+
+    if app.config['TEMPLATE_WARMUP']:
+        with app.app_context():
+            templating.warm_templates()
+    return app
@@ -0,0 +1,243 @@
+"""Fingerprinted, minified and precompressed static assets.
+
+``flask --app main build-assets`` copies the bundles in ``ASSETS`` to
+``static/dist/`` under content-hashed names (``style.3f2a9c1e.css``),
+minifying CSS and JS on the way and writing ``.gz``/``.br`` siblings next to
+each file, and records the mapping in ``static/dist/manifest.json``. Files
+of earlier builds are kept for ``ASSET_MAX_AGE`` after they are superseded.
+Templates call ``asset_url('css/style.css')``: with a manifest it points at
+the hashed file, which is served with a one-year ``immutable`` lifetime
+because its name changes whenever its content does; without one (a fresh
+checkout, or while editing) it falls back to the plain ``static`` URL.
+
+``rcssmin``, ``rjsmin`` and ``brotli`` are used when installed. Otherwise CSS
+gets a built-in minifier, JS only loses comment lines and indentation, and
+no ``.br`` files are written.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import time
+
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:  # pragma: no cover - rcssmin is optional
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:  # pragma: no cover - rjsmin is optional
+    rjsmin = None
+
+ASSETS = ('css/style.css', 'js/main.js', 'images/*.svg')
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+bp = Blueprint('assets', __name__, cli_group=None)
+
+_manifest = None
+_manifest_mtime = None
+
+
+_CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"' r"|'(?:\\.|[^'\\])*'")
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def _minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    # Set strings (e.g. data: URLs) aside so only real CSS is rewritten.
+    strings = []
+
+    def stash(match):
+        strings.append(match.group())
+        return f'\0{len(strings) - 1}\0'
+
+    css = _CSS_STRING.sub(stash, text)
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css).replace(';}', '}').replace(': ', ':').strip()
+    return re.sub(r'\0(\d+)\0', lambda match: strings[int(match.group(1))], css)
+
+
+def _minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    # Without a real tokenizer only changes that cannot alter behaviour are
+    # safe: whole-line // comments and indentation. Newlines stay for ASI.
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+MINIFIERS = {'.css': _minify_css, '.js': _minify_js}
+
+
+def _dist_dir(flask_app):
+    return os.path.join(flask_app.static_folder, DIST_DIR)
+
+
+def _sources(static_folder):
+    for pattern in ASSETS:
+        for path in sorted(glob.glob(os.path.join(static_folder, pattern))):
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/')
+
+
+def _write(path, data):
+    with open(path + '.tmp', 'wb') as out:
+        out.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def _read_manifest(dist):
+    try:
+        with open(os.path.join(dist, MANIFEST)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return {}
+
+
+def _prune(dist, keep, max_age):
+    """Delete built files not in ``keep`` that were superseded more than ``max_age`` seconds ago."""
+    cutoff = time.time() - max_age
+    for folder, _, filenames in os.walk(dist):
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            name = os.path.relpath(path, dist).replace(os.sep, '/')
+            if name == MANIFEST or re.sub(r'\.(gz|br)$', '', name) in keep:
+                continue
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def build(flask_app, max_age=None):
+    """Rebuild ``static/dist`` and return the new manifest.
+
+    Files from earlier builds stay for ``max_age`` seconds (``ASSET_MAX_AGE``)
+    after they were superseded: pages rendered before the build, in browsers,
+    CDNs or the page cache, still link them.
+    """
+    if max_age is None:
+        max_age = flask_app.config['ASSET_MAX_AGE']
+    static_folder = flask_app.static_folder
+    dist = _dist_dir(flask_app)
+    os.makedirs(dist, exist_ok=True)
+    previous = _read_manifest(dist)
+
+    manifest = {}
+    for name in _sources(static_folder):
+        stem, ext = os.path.splitext(name)
+        with open(os.path.join(static_folder, name), 'rb') as source:
+            data = source.read()
+        if ext in MINIFIERS:
+            data = MINIFIERS[ext](data.decode('utf-8')).encode('utf-8')
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        manifest[name] = hashed
+        target = os.path.join(dist, hashed)
+        if os.path.isfile(target):
+            continue  # same content, same name: already built
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write(target, data)
+        if ext in COMPRESSIBLE:
+            _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(target + '.br', brotli.compress(data, quality=11))
+
+    # The clock for keeping a file starts when it stops being current.
+    now = time.time()
+    for hashed in set(previous.values()) - set(manifest.values()):
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.utime(os.path.join(dist, hashed + suffix), (now, now))
+            except FileNotFoundError:
+                pass
+    # The manifest goes last, so it never names a file that is not written yet.
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    _prune(dist, set(manifest.values()), max_age)
+    return manifest
+
+
+def manifest_version():
+    """Token that changes with every build; part of the page cache's versions."""
+    manifest()
+    return _manifest_mtime
+
+
+def manifest():
+    """Return the current manifest, re-reading it when the build changes."""
+    global _manifest, _manifest_mtime
+    path = os.path.join(_dist_dir(current_app), MANIFEST)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        _manifest, _manifest_mtime = {}, None
+        return _manifest
+    if mtime != _manifest_mtime:
+        with open(path) as source:
+            _manifest = json.load(source)
+        _manifest_mtime = mtime
+    return _manifest
+
+
+@bp.app_template_global()
+def asset_url(filename):
+    """URL for a static asset, fingerprinted when a build is available."""
+    hashed = manifest().get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('public.asset', filename=hashed)
+
+
+def send_asset(filename):
+    """Serve a built asset, preferring a precompressed copy the client accepts."""
+    dist = _dist_dir(current_app)
+    _, ext = os.path.splitext(filename)
+    encoding = None
+    if ext in COMPRESSIBLE:
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.isfile(os.path.join(dist, filename + suffix)):
+                encoding = candidate
+                break
+
+    if encoding is None:
+        response = send_from_directory(dist, filename, max_age=31536000)
+    else:
+        suffix = '.br' if encoding == 'br' else '.gz'
+        response = send_from_directory(dist, filename + suffix, max_age=31536000,
+                                       mimetype=_mimetype(filename))
+        response.headers['Content-Encoding'] = encoding
+    if ext in COMPRESSIBLE:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def _mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint, minify and precompress the static bundles."""
+    built = build(current_app)
+    static_folder = current_app.static_folder
+    for name, hashed in sorted(built.items()):
+        before = os.path.getsize(os.path.join(static_folder, name))
+        after = os.path.getsize(os.path.join(_dist_dir(current_app), hashed))
+        print(f"{name} -> {DIST_DIR}/{hashed} ({before} -> {after} bytes)")
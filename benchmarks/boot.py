@@ -0,0 +1,142 @@
+"""Import and boot time of the application.
+
+Reports, for the tree at ``--root`` (this checkout by default):
+
+* how long a fresh interpreter takes to ``import main`` (which builds the
+  app), median of ``--runs``;
+* the slowest modules in that import, from ``python -X importtime``;
+* with gunicorn installed, how long ``--workers`` workers take to answer
+  their first request with and without ``preload_app``, and the memory
+  (PSS, so shared pages are split between processes) they use together.
+
+Usage::
+
+    python benchmarks/boot.py [--runs 10] [--workers 4] [--root PATH]
+
+Pointing ``--root`` at an older checkout gives a before/after comparison.
+A throwaway SQLite database is bootstrapped first; the instance folder is
+not touched.
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+IMPORT_SNIPPET = 'import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)'
+
+
+def import_times(root, env, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=root, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(root, env, count=8):
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=root, env=env,
+                            check=True, capture_output=True, text=True).stderr
+    direct = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # Two spaces of indentation per nesting level: three spaces is whatever
+        # ``main`` (and the app factory it calls) imports directly.
+        if len(name) - len(name.lstrip()) == 3:
+            direct.append((int(cumulative_us), name.strip()))
+    return sorted(direct, reverse=True)[:count]
+
+
+def pss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as listing:
+            return [int(child) for child in listing.read().split()]
+    except OSError:
+        return []
+
+
+def gunicorn_boot(root, env, workers, preload):
+    port = 8000 + os.getpid() % 1000
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', 'main:app'],
+        cwd=root, env=dict(env, GUNICORN_PRELOAD='1' if preload else '0'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/about', timeout=1).read()
+                break
+            except OSError:
+                if process.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        # Wait for every worker, then hit them all so lazily loaded state counts.
+        while len(children(process.pid)) < workers:
+            time.sleep(0.05)
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/services', timeout=5).read()
+        all_ready = time.perf_counter() - started
+        memory = pss_kb(process.pid) + sum(pss_kb(child) for child in children(process.pid))
+        return ready, all_ready, memory
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--root', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='furnitech-boot-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               INSTANCE_PATH=os.path.join(workdir, 'instance'), JINJA_CACHE_DIR=os.path.join(workdir, 'jinja'),
+               LOG_LEVEL='WARNING', FLASK_DEBUG='0')
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'bootstrap'], cwd=args.root, env=env,
+                       check=True, capture_output=True)
+
+        samples = import_times(args.root, env, args.runs)
+        print(f"import main: median {statistics.median(samples) * 1000:.0f} ms, "
+              f"min {min(samples) * 1000:.0f} ms over {args.runs} runs")
+        print("slowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports(args.root, env):
+            print(f"  {cumulative_us / 1000:>7.1f} ms  {name}")
+
+        if importlib.util.find_spec('gunicorn') is not None:
+            print(f"gunicorn, {args.workers} workers:")
+            for preload in (False, True):
+                ready, all_ready, memory = gunicorn_boot(args.root, env, args.workers, preload)
+                print(f"  preload={'on ' if preload else 'off'}  first response {ready * 1000:>5.0f} ms, "
+                      f"all workers serving {all_ready * 1000:>5.0f} ms, PSS {memory / 1024:.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Sustained contact form submissions/second and POST latency.
+
+The tree at ``--root`` (this checkout by default) is started under
+gunicorn with ``--workers`` workers on a throwaway SQLite database, with
+the per-IP/per-phone rate limits lifted, and ``--concurrency`` clients
+POST ``/contact`` with distinct phone numbers for ``--duration`` seconds.
+Reports accepted submissions/second and p50/p99 latency of the POST, then
+how long the accepted submissions took to reach ``contact_message``: with
+buffered ingestion they land there on the background flusher's schedule,
+not inside the request.
+
+Usage::
+
+    python benchmarks/contact.py [--root PATH] [--workers 4] [--concurrency 16]
+                                 [--duration 10] [--warmup 2]
+
+As with ``pages.py``, pointing ``--root`` at a checkout from before
+buffered ingestion gives the before/after comparison.
+"""
+import argparse
+import os
+import random
+import shutil
+import signal
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from pages import ROOT, hammer, report_line, scratch_env, serve
+
+DELIVERY_TIMEOUT = 60
+
+
+def inbox_count(database):
+    with closing(sqlite3.connect(database, timeout=30)) as connection:
+        return connection.execute('SELECT count(*) FROM contact_message').fetchone()[0]
+
+
+def submit(client):
+    return client.form('/contact', {
+        'name': 'Load Test', 'phone': f'+91 8{random.randrange(10 ** 9):09d}',
+        'service_interest': 'Modular Kitchen', 'message': 'Please call me back about a kitchen quote.',
+    })[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--root', default=ROOT, help='Checkout to benchmark.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds measured.')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds run, unmeasured, first.')
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    port = 9000 + os.getpid() % 1000
+    workdir = tempfile.mkdtemp(prefix='furnitech-contact-')
+    database = os.path.join(workdir, 'bench.db')
+    env = dict(scratch_env(workdir), CONTACT_RATE_PER_MINUTE='1000000000', CONTACT_RATE_BURST='1000000000')
+    try:
+        process = serve(root, env, args.workers, port)
+        try:
+            before = inbox_count(database)
+            warmup, _, _ = hammer(port, submit, args.concurrency, args.warmup)
+            samples, failures, elapsed = hammer(port, submit, args.concurrency, args.duration)
+            finished = time.perf_counter()
+            expected = before + len(warmup) + len(samples)
+            while inbox_count(database) < expected and time.perf_counter() - finished < DELIVERY_TIMEOUT:
+                time.sleep(0.05)
+            delivered = inbox_count(database) - before
+            delay = time.perf_counter() - finished
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{root}: {args.workers} workers, {args.concurrency} clients")
+    print(f"  {'route':<16}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    print(report_line('POST /contact', samples, failures, elapsed))
+    print(f"  {delivered} of {len(warmup) + len(samples)} accepted submissions in the inbox "
+          f"{delay:.2f} s after the last POST")
+
+
+if __name__ == '__main__':
+    main()
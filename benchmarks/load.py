@@ -0,0 +1,620 @@
+"""Load test of every route under gunicorn, with a regression check.
+
+For each database (a temporary SQLite file, plus PostgreSQL when
+``--postgres`` or ``BENCH_POSTGRES_URL`` names a server to create a scratch
+database on), each engine profile in ``--db-profile`` (``DB_PROFILE``, see
+``database.py``) and each scale (that many synthetic services and contact
+messages), the app is seeded, started under gunicorn with
+``gunicorn.conf.py`` and driven by a mixed workload at increasing
+concurrency. Every simulated client runs:
+
+* public GETs: home, services, search page and JSON API, about, contact,
+  an uploaded image, a built asset (when ``static/dist`` exists), and
+  ``/metrics``;
+* contact form POSTs;
+* admin flows on its own logged-in session: login/logout, dashboard,
+  content edits, services (including multipart image uploads), inbox pages
+  with filters, search and cursors, the JSON inbox, marking read, bulk
+  actions, deletes, change-password and the metrics page.
+
+The report gives, per route, requests/second, p50/p95/p99 latency and
+errors. Each step also reports total throughput and the memory (PSS) of
+every worker; with several profiles, a last table compares their
+throughput. ``--routes`` narrows the workload to the named routes, e.g.
+the public catalog on its own, at 10,000 seeded services::
+
+    python benchmarks/load.py --scales 10000 --routes 'GET /services'
+
+``--save-baseline`` stores the results in ``--baseline`` (default
+``benchmarks/baseline.json``). Later runs compare against that file and
+exit with status 1 when a step's throughput drops, or a route's p95
+latency grows, by more than ``--threshold``, or when a route fails more
+often than it did. Routes with too few samples for a meaningful p95 are
+listed rather than compared. Record the baseline on the
+machine that runs the check; numbers from different hardware do not compare.
+
+Usage::
+
+    python benchmarks/load.py [--scales 10,1000,10000,100000] [--concurrency 1,8,32]
+                              [--duration 10] [--workers 4] [--postgres URL]
+                              [--db-profile basic,tuned] [--routes 'GET /,GET /about']
+                              [--save-baseline] [--baseline PATH] [--threshold 0.25]
+
+Everything the app writes (database, instance folder, uploads) goes to a
+temporary directory.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+from boot import children, pss_kb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+WORDS = ['wardrobe', 'kitchen', 'modular', 'office', 'chair', 'table', 'sofa', 'bed', 'cabinet', 'desk',
+         'shelf', 'oak', 'teak', 'glass', 'custom', 'storage', 'installation', 'repair', 'polish', 'drawer']
+ADMIN = {'username': 'admin', 'password': 'admin123'}
+METRICS_TOKEN = 'bench'
+SEED_CHUNK = 5000
+SEEDED_IMAGES = 20
+# A p95 has to move by more than this too, so sub-millisecond jitter is not a regression,
+# and rare flows need this many samples in both runs before their p95 means anything.
+MIN_P95_DELTA_MS = 2.0
+MIN_SAMPLES = 20
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def jpeg(width=1200, height=800):
+    """A photo-sized JPEG, or None without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    image = Image.effect_noise((width, height), 64).convert('RGB')
+    encoded = io.BytesIO()
+    image.save(encoded, 'JPEG', quality=85)
+    return encoded.getvalue()
+
+
+def seed(count):
+    """Insert ``count`` services and ``count`` contact messages (child process)."""
+    sys.path.insert(0, ROOT)
+    from datetime import datetime, timedelta
+
+    import storage
+    from app import create_app, db
+    from models import ContactMessage, Service
+    from ordering import ORDER_GAP
+
+    rng = random.Random(count)
+    app = create_app({'TEMPLATE_WARMUP': False})
+    with app.app_context():
+        image_keys = []
+        photo = jpeg(640, 480)
+        if photo is not None:
+            for index in range(min(SEEDED_IMAGES, count)):
+                key = f'uploads/{uuid.uuid4().hex}.jpg'
+                storage.get_storage().save(key, io.BytesIO(photo + index.to_bytes(4, 'big')))
+                image_keys.append(key)
+
+        now = datetime.utcnow()
+        # After the bootstrap services; positions are unique within a category.
+        last_position = db.session.scalar(db.select(db.func.max(Service.order_index))) or 0
+        for start in range(0, count, SEED_CHUNK):
+            db.session.execute(db.insert(Service), [{
+                'title': f'{sentence(rng, 2).title()} {index}',
+                'description': sentence(rng, 30),
+                'category': ('home', 'office')[index % 2],
+                'image_path': image_keys[index] if index < len(image_keys) else None,
+                'order_index': last_position + (index + 1) * ORDER_GAP,
+                'is_active': index % 10 != 0,
+                'created_at': now,
+            } for index in range(start, min(start + SEED_CHUNK, count))])
+            db.session.execute(db.insert(ContactMessage), [{
+                'name': f'Customer {index}',
+                'phone': f'+91 9{index:09d}',
+                'service_interest': sentence(rng, 2),
+                'message': sentence(rng, 40),
+                'is_read': rng.random() < 0.7,
+                'created_at': now - timedelta(minutes=rng.randrange(525600)),
+            } for index in range(start, min(start + SEED_CHUNK, count))])
+            db.session.commit()
+        print(json.dumps({'images': image_keys}))
+
+
+class Client:
+    """One simulated browser: a cookie and one request at a time.
+
+    gunicorn's sync workers close the connection after every response, so
+    each request opens a new one, as a browser behind no proxy would.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            value = cookie.split(';', 1)[0]
+            self.cookie = None if value.endswith('=') else value
+        return response.status, data
+
+    def form(self, path, fields):
+        body = urllib.parse.urlencode(fields, doseq=True)
+        return self.request('POST', path, body, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def multipart(self, path, fields, files):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content, mimetype) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: {mimetype}\r\n\r\n'.encode() + content + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self.request('POST', path, b''.join(parts), {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def login(self):
+        return self.form('/admin/login', ADMIN)
+
+
+class User:
+    """A thread's pair of clients (visitor and admin) and the workload they run."""
+
+    def __init__(self, port, context, rng):
+        self.visitor = Client(port)
+        self.admin = Client(port)
+        self.context = context
+        self.rng = rng
+        self.cursor = None
+        self.admin.login()
+
+    # Each action returns (status, body) and may accept extra statuses below.
+    def home(self):
+        return self.visitor.request('GET', '/')
+
+    def services(self):
+        return self.visitor.request('GET', '/services')
+
+    def service_search(self):
+        return self.visitor.request('GET', f'/services/search?q={self.rng.choice(WORDS)}')
+
+    def service_search_api(self):
+        return self.visitor.request('GET', f'/api/services/search?q={self.rng.choice(WORDS)[:4]}')
+
+    def about(self):
+        return self.visitor.request('GET', '/about')
+
+    def contact(self):
+        return self.visitor.request('GET', '/contact')
+
+    def contact_post(self):
+        return self.visitor.form('/contact', {
+            'name': 'Load Test', 'phone': f'+91 8{self.rng.randrange(10 ** 9):09d}',
+            'service_interest': sentence(self.rng, 2), 'message': sentence(self.rng, 25),
+        })
+
+    def media(self):
+        return self.visitor.request('GET', f"/media/{self.rng.choice(self.context['images'])}")
+
+    def asset(self):
+        return self.visitor.request('GET', f"/static/dist/{self.rng.choice(self.context['assets'])}",
+                                    headers={'Accept-Encoding': 'gzip'})
+
+    def metrics(self):
+        return self.visitor.request('GET', '/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'})
+
+    def admin_relogin(self):
+        self.admin.request('GET', '/admin/logout')
+        return self.admin.login()
+
+    def admin_dashboard(self):
+        return self.admin.request('GET', '/admin')
+
+    def admin_content(self):
+        return self.admin.request('GET', '/admin/content')
+
+    def admin_content_post(self):
+        return self.admin.form('/admin/content', {'section': 'about', 'content': sentence(self.rng, 60)})
+
+    def admin_services(self):
+        return self.admin.request('GET', '/admin/services')
+
+    def admin_service_upload(self):
+        # Unique trailing bytes give every upload its own digest, so each one
+        # is stored and gets variants generated, like a new photo would.
+        photo = self.context['photo'] + uuid.uuid4().bytes
+        return self.admin.multipart('/admin/services', {
+            'action': 'edit', 'service_id': self.rng.randint(1, self.context['services']),
+            'title': sentence(self.rng, 3).title(), 'description': sentence(self.rng, 30), 'category': 'home',
+        }, {'image': ('photo.jpg', photo, 'image/jpeg')})
+
+    def admin_change_password(self):
+        return self.admin.request('GET', '/admin/change-password')
+
+    def admin_messages(self):
+        return self.admin.request('GET', '/admin/messages')
+
+    def admin_messages_filtered(self):
+        return self.admin.request('GET', f"/admin/messages?status=unread&service={self.rng.choice(WORDS)}")
+
+    def admin_messages_search(self):
+        return self.admin.request('GET', f"/admin/messages?q={self.rng.choice(WORDS)}")
+
+    def admin_messages_api(self):
+        path = '/admin/api/messages'
+        if self.cursor:
+            path += f'?before={urllib.parse.quote(self.cursor)}'
+        status, body = self.admin.request('GET', path)
+        if status == 200:
+            self.cursor = json.loads(body)['next_cursor']
+        return status, body
+
+    def _message_id(self):
+        return self.rng.randint(1, self.context['messages'])
+
+    def admin_mark_read(self):
+        return self.admin.request('POST', f'/admin/message/{self._message_id()}/read')
+
+    def admin_bulk_read(self):
+        return self.admin.form('/admin/messages/bulk', {
+            'action': 'read', 'message_ids': [self._message_id() for _ in range(20)],
+        })
+
+    def admin_delete(self):
+        return self.admin.request('POST', f'/admin/message/{self._message_id()}/delete')
+
+    def admin_metrics(self):
+        return self.admin.request('GET', '/admin/metrics')
+
+
+# name, weight, method, extra statuses that count as success
+WORKLOAD = [
+    ('GET /', 10, User.home, ()),
+    ('GET /services', 8, User.services, ()),
+    ('GET /services/search', 3, User.service_search, ()),
+    ('GET /api/services/search', 3, User.service_search_api, ()),
+    ('GET /about', 4, User.about, ()),
+    ('GET /contact', 3, User.contact, ()),
+    ('POST /contact', 2, User.contact_post, ()),
+    ('GET /media/<key>', 3, User.media, ()),
+    ('GET /static/dist/<asset>', 3, User.asset, ()),
+    ('GET /metrics', 0.5, User.metrics, ()),
+    ('admin logout+login', 0.2, User.admin_relogin, ()),
+    ('GET /admin', 2, User.admin_dashboard, ()),
+    ('GET /admin/content', 1, User.admin_content, ()),
+    ('POST /admin/content', 0.2, User.admin_content_post, ()),
+    ('GET /admin/services', 1.5, User.admin_services, ()),
+    # Each upload also encodes a dozen JPEG/WebP/AVIF variants in the worker.
+    ('POST /admin/services (upload)', 0.1, User.admin_service_upload, ()),
+    ('GET /admin/change-password', 0.5, User.admin_change_password, ()),
+    ('GET /admin/messages', 3, User.admin_messages, ()),
+    ('GET /admin/messages (filters)', 1.5, User.admin_messages_filtered, ()),
+    ('GET /admin/messages (search)', 1.5, User.admin_messages_search, ()),
+    ('GET /admin/api/messages', 2, User.admin_messages_api, ()),
+    ('POST /admin/message/<id>/read', 1, User.admin_mark_read, (404,)),
+    ('POST /admin/messages/bulk', 0.3, User.admin_bulk_read, ()),
+    ('POST /admin/message/<id>/delete', 0.2, User.admin_delete, (404,)),
+    ('GET /admin/metrics', 0.5, User.admin_metrics, ()),
+]
+
+
+def workload(context):
+    routes = context.get('routes')
+    skip = set()
+    if not context['images']:
+        skip.add('GET /media/<key>')
+    if not context['assets']:
+        skip.add('GET /static/dist/<asset>')
+    if context['photo'] is None:
+        skip.add('POST /admin/services (upload)')
+    return [entry for entry in WORKLOAD if entry[0] not in skip and (not routes or entry[0] in routes)]
+
+
+def drive(port, context, concurrency, duration):
+    """Run the workload from ``concurrency`` threads for ``duration`` seconds."""
+    actions = workload(context)
+    weights = [weight for _, weight, _, _ in actions]
+    samples = {name: [] for name, _, _, _ in actions}
+    errors = {name: 0 for name, _, _, _ in actions}
+    lock = threading.Lock()
+    window = {}
+
+    def open_window():
+        # Runs once every client has logged in, before any of them is released.
+        window['start'] = time.perf_counter()
+        window['deadline'] = window['start'] + duration
+
+    start = threading.Barrier(concurrency, action=open_window)
+
+    def run(index):
+        rng = random.Random(index)
+        user = User(port, context, rng)
+        local = {name: [] for name in samples}
+        failed = {name: 0 for name in samples}
+        start.wait()
+        while time.perf_counter() < window['deadline']:
+            name, _, action, accepted = rng.choices(actions, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _ = action(user)
+            except (OSError, http.client.HTTPException):
+                status = None
+            elapsed = time.perf_counter() - started
+            if status is not None and (status < 400 or status in accepted):
+                local[name].append(elapsed)
+            else:
+                failed[name] += 1
+        with lock:
+            for name in samples:
+                samples[name].extend(local[name])
+                errors[name] += failed[name]
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - window['start']
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def summarize(samples, errors, elapsed):
+    routes = {}
+    for name, values in samples.items():
+        if not values and not errors[name]:
+            continue
+        values.sort()
+        routes[name] = {
+            'count': len(values),
+            'rps': len(values) / elapsed,
+            'p50': percentile(values, 0.50) * 1000 if values else None,
+            'p95': percentile(values, 0.95) * 1000 if values else None,
+            'p99': percentile(values, 0.99) * 1000 if values else None,
+            'errors': errors[name],
+        }
+    return {
+        'throughput': sum(route['count'] for route in routes.values()) / elapsed,
+        'errors': sum(errors.values()),
+        'routes': routes,
+    }
+
+
+def postgres_database(url, name):
+    """Create the scratch database ``name`` on the server at ``url``; return its URL and a dropper."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import make_url
+
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    engine = create_engine(url, isolation_level='AUTOCOMMIT')
+    with engine.connect() as connection:
+        connection.execute(text(f'CREATE DATABASE {name}'))
+
+    def drop():
+        with engine.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)'))
+        engine.dispose()
+
+    return make_url(url).set(database=name).render_as_string(hide_password=False), drop
+
+
+def built_assets():
+    try:
+        with open(os.path.join(ROOT, 'static', 'dist', 'manifest.json')) as manifest:
+            return sorted(set(json.load(manifest).values()))
+    except (OSError, ValueError):
+        return []
+
+
+def start_gunicorn(env, port):
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'main:app'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    while True:
+        try:
+            Client(port).request('GET', '/about')
+            return process
+        except OSError:
+            if process.poll() is not None or time.perf_counter() - started > 60:
+                process.kill()
+                raise RuntimeError('gunicorn did not start')
+            time.sleep(0.05)
+
+
+def run_scale(database, profile, database_url, scale, args, workdir, photo):
+    port = 9000 + os.getpid() % 1000
+    name = f'{database}-{profile}-{scale}'
+    env = dict(
+        os.environ, DATABASE_URL=database_url, DB_PROFILE=profile, INSTANCE_PATH=os.path.join(workdir, f'instance-{name}'),
+        STORAGE_LOCAL_ROOT=os.path.join(workdir, f'storage-{name}'), SESSION_SECRET='bench',
+        METRICS_TOKEN=METRICS_TOKEN, CONTACT_RATE_PER_MINUTE='1000000000', CONTACT_RATE_BURST='1000000000',
+        WEB_CONCURRENCY=str(args.workers), BIND=f'127.0.0.1:{port}', LOG_LEVEL='WARNING', FLASK_DEBUG='0',
+    )
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'bootstrap'], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+    seeded = subprocess.run([sys.executable, __file__, '--seed', str(scale)], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    context = json.loads(seeded.strip().splitlines()[-1])
+    context.update(assets=built_assets(), photo=photo, services=scale, messages=scale, routes=args.routes)
+
+    process = start_gunicorn(env, port)
+    results = {}
+    try:
+        for concurrency in args.concurrency:
+            drive(port, context, concurrency, args.warmup)
+            step = summarize(*drive(port, context, concurrency, args.duration))
+            step['workers_pss_mib'] = [round(pss_kb(pid) / 1024, 1) for pid in children(process.pid)]
+            results[str(concurrency)] = step
+            report(f'{database}/{profile}', scale, concurrency, step)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+    return results
+
+
+def fmt(value):
+    return f'{value:8.1f}' if value is not None else '       -'
+
+
+def report(database, scale, concurrency, step):
+    memory = ' / '.join(f'{mib:.0f}' for mib in step['workers_pss_mib'])
+    print(f"\n{database}, {scale} rows, {concurrency} clients: {step['throughput']:.0f} req/s, "
+          f"{step['errors']} errors, worker PSS {memory} MiB")
+    print(f"  {'route':<34}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name, route in step['routes'].items():
+        print(f"  {name:<34}{route['rps']:8.1f} {fmt(route['p50'])} {fmt(route['p95'])} {fmt(route['p99'])}"
+              f"{route['errors']:>8}")
+    sys.stdout.flush()
+
+
+def compare_profiles(results, profiles):
+    print(f"\n  {'req/s by DB_PROFILE':<36}" + ''.join(f'{profile:>10}' for profile in profiles))
+    databases = sorted({key.split('/')[0] for key in results})
+    for database in databases:
+        runs = [results.get(f'{database}/{profile}', {}) for profile in profiles]
+        for scale, steps in runs[0].items():
+            for concurrency in steps:
+                where = f'{database}, {scale} rows, {concurrency} clients'
+                print(f'  {where:<36}' + ''.join(f"{run[scale][concurrency]['throughput']:10.0f}" for run in runs))
+
+
+def regressions(results, baseline, threshold):
+    """Return the regressions against ``baseline`` and the route checks skipped for lack of samples."""
+    found, skipped = [], []
+    for database, scales in results.items():
+        for scale, steps in scales.items():
+            for concurrency, step in steps.items():
+                base = baseline.get(database, {}).get(scale, {}).get(concurrency)
+                if base is None:
+                    continue
+                where = f'{database}/{scale} rows/{concurrency} clients'
+                if step['throughput'] < base['throughput'] * (1 - threshold):
+                    found.append(f"{where}: throughput {step['throughput']:.0f} req/s, "
+                                 f"baseline {base['throughput']:.0f}")
+                for name, route in step['routes'].items():
+                    base_route = base['routes'].get(name)
+                    # Any new failure counts, however few requests the route got.
+                    base_errors = base_route['errors'] if base_route else 0
+                    if route['errors'] > base_errors:
+                        found.append(f"{where}: {name} {route['errors']} errors, baseline {base_errors}")
+                    if not base_route:
+                        continue
+                    if min(route['count'], base_route['count']) < MIN_SAMPLES:
+                        skipped.append(f"{where}: {name} ({route['count']} samples, "
+                                       f"baseline {base_route['count']})")
+                        continue
+                    if (route['p95'] > base_route['p95'] * (1 + threshold)
+                            and route['p95'] - base_route['p95'] > MIN_P95_DELTA_MS):
+                        found.append(f"{where}: {name} p95 {route['p95']:.1f} ms, "
+                                     f"baseline {base_route['p95']:.1f} ms")
+    return found, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scales', default='10,1000,10000,100000')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds measured per step.')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds run, unmeasured, before each step.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--db-profile', default='tuned',
+                        help='Comma-separated DB_PROFILE values to run, e.g. basic,tuned.')
+    parser.add_argument('--routes', help='Comma-separated route names to run instead of the whole workload.')
+    parser.add_argument('--postgres', default=os.environ.get('BENCH_POSTGRES_URL'),
+                        help='Server URL on which a scratch database is created and dropped.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.seed is not None:
+        seed(args.seed)
+        return
+
+    args.concurrency = [int(value) for value in args.concurrency.split(',')]
+    args.db_profile = args.db_profile.split(',')
+    if args.routes:
+        args.routes = [name.strip() for name in args.routes.split(',')]
+        unknown = set(args.routes) - {name for name, _, _, _ in WORKLOAD}
+        if unknown:
+            parser.error(f"unknown route(s): {', '.join(sorted(unknown))}")
+    scales = [int(value) for value in args.scales.split(',')]
+    photo = jpeg()
+    workdir = tempfile.mkdtemp(prefix='furnitech-load-')
+    results = {}
+    try:
+        for scale in scales:
+            for profile in args.db_profile:
+                database_url = f"sqlite:///{os.path.join(workdir, f'bench-{profile}-{scale}.db')}"
+                results.setdefault(f'sqlite/{profile}', {})[str(scale)] = run_scale(
+                    'sqlite', profile, database_url, scale, args, workdir, photo)
+                if args.postgres:
+                    database_url, drop = postgres_database(args.postgres,
+                                                           f'furnitech_bench_{os.getpid()}_{profile}_{scale}')
+                    try:
+                        results.setdefault(f'postgresql/{profile}', {})[str(scale)] = run_scale(
+                            'postgresql', profile, database_url, scale, args, workdir, photo)
+                    finally:
+                        drop()
+        if not args.postgres:
+            print("\nPostgreSQL skipped: pass --postgres URL or set BENCH_POSTGRES_URL.")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if len(args.db_profile) > 1:
+        compare_profiles(results, args.db_profile)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline) as baseline_file:
+        found, skipped = regressions(results, json.load(baseline_file), args.threshold)
+    if skipped:
+        print(f"\np95 not compared, fewer than {MIN_SAMPLES} samples:")
+        for line in skipped:
+            print(f"  {line}")
+    if found:
+        print(f"\n{len(found)} regression(s) beyond {args.threshold:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Requests/second on the public pages ``/`` and ``/about``.
+
+The tree at ``--root`` (this checkout by default) is started under
+gunicorn with ``--workers`` workers on a throwaway SQLite database, and
+``--concurrency`` clients fetch each page in turn for ``--duration``
+seconds, after ``--warmup`` seconds that are not measured. Reports req/s
+and p50/p99 latency per page.
+
+Usage::
+
+    python benchmarks/pages.py [--root PATH] [--workers 4] [--concurrency 8]
+                               [--duration 10] [--warmup 2]
+
+Pointing ``--root`` at a checkout from before the settings, content and
+page caches gives the before/after comparison::
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/pages.py --root /tmp/before
+    python benchmarks/pages.py
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from load import Client, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/', '/about']
+
+
+def serve(root, env, workers, port):
+    """Bootstrap a database for the tree at ``root`` and start it under gunicorn."""
+    if os.path.exists(os.path.join(root, 'bootstrap.py')):
+        command = [sys.executable, '-m', 'flask', '--app', 'main', 'bootstrap']
+    else:
+        # Older trees create their tables when the app is imported.
+        command = [sys.executable, '-c', 'import main']
+    subprocess.run(command, cwd=root, env=env, check=True, capture_output=True)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                                '--bind', f'127.0.0.1:{port}', 'main:app'],
+                               cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    while True:
+        try:
+            Client(port).request('GET', '/about')
+            return process
+        except OSError:
+            if process.poll() is not None or time.perf_counter() - started > 60:
+                process.kill()
+                raise RuntimeError('gunicorn did not start')
+            time.sleep(0.05)
+
+
+def scratch_env(workdir):
+    """Environment for a server whose database and instance folder live in ``workdir``."""
+    return dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                INSTANCE_PATH=os.path.join(workdir, 'instance'), STORAGE_LOCAL_ROOT=os.path.join(workdir, 'storage'),
+                SESSION_SECRET='bench', LOG_LEVEL='WARNING', FLASK_DEBUG='0')
+
+
+def hammer(port, action, concurrency, duration):
+    """Call ``action(client)`` from ``concurrency`` threads for ``duration`` seconds.
+
+    ``action`` returns the response status. Returns the sorted latencies of
+    the successful calls, the number of failures and the elapsed time.
+    """
+    samples = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run():
+        client = Client(port)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = action(client)
+            except OSError:
+                status = None
+            if status is not None and status < 400:
+                local.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with lock:
+            samples.extend(local)
+            failures[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(samples), failures[0], time.perf_counter() - started
+
+
+def report_line(name, samples, failures, elapsed):
+    if not samples:
+        return f'  {name:<16}{"-":>8}{"-":>9}{"-":>9}{failures:>8}'
+    return (f'  {name:<16}{len(samples) / elapsed:8.1f}{percentile(samples, 0.50) * 1000:9.1f}'
+            f'{percentile(samples, 0.99) * 1000:9.1f}{failures:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--root', default=ROOT, help='Checkout to benchmark.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds measured per page.')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds run, unmeasured, before each page.')
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    port = 9000 + os.getpid() % 1000
+    workdir = tempfile.mkdtemp(prefix='furnitech-pages-')
+    try:
+        process = serve(root, scratch_env(workdir), args.workers, port)
+        try:
+            print(f"{root}: {args.workers} workers, {args.concurrency} clients")
+            print(f"  {'page':<16}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+            for page in PAGES:
+                def fetch(client, page=page):
+                    return client.request('GET', page)[0]
+                hammer(port, fetch, args.concurrency, args.warmup)
+                print(report_line(page, *hammer(port, fetch, args.concurrency, args.duration)))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Time-to-first-byte per route in a freshly started worker.
+
+Every measurement runs in a new interpreter, the way a gunicorn worker
+starts after a deploy or a scale-up, and reports how long importing the app
+took and how long the first request to one route took. Three situations are
+compared:
+
+* ``cold``: empty bytecode cache, no warm-up; the first request to each
+  page pays for compiling its templates.
+* ``warm-up``: empty bytecode cache, templates compiled during boot.
+* ``shared cache``: another worker already filled the bytecode cache.
+
+Usage::
+
+    python benchmarks/startup.py [--runs 5]
+
+A throwaway SQLite database and cache directory are used, so the instance
+folder is not touched.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PUBLIC_ROUTES = ['/', '/services', '/about', '/contact', '/admin/login']
+ADMIN_ROUTES = ['/admin', '/admin/services', '/admin/messages', '/admin/content']
+
+
+def child(route):
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from main import app
+    booted = time.perf_counter()
+
+    client = app.test_client()
+    if route.startswith('/admin') and route != '/admin/login':
+        # The bootstrap step seeds this admin; logging in renders no template.
+        client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    request_started = time.perf_counter()
+    response = client.get(route)
+    # The test client has read the whole body by now; for these page sizes
+    # that is within noise of the first byte.
+    finished = time.perf_counter()
+    assert response.status_code == 200, (route, response.status_code)
+    print(json.dumps({'boot': booted - started, 'ttfb': finished - request_started}))
+
+
+def run_child(route, env):
+    output = subprocess.run([sys.executable, __file__, '--child', route], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='furnitech-startup-')
+    shared_cache = os.path.join(workdir, 'jinja-shared')
+    base_env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                    INSTANCE_PATH=os.path.join(workdir, 'instance'), LOG_LEVEL='WARNING', FLASK_DEBUG='0')
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'bootstrap'],
+                       env=dict(base_env, JINJA_CACHE_DIR=shared_cache, TEMPLATE_WARMUP='0'), cwd=ROOT,
+                       check=True, capture_output=True)
+        # Fill the shared bytecode cache, as the first worker of a deploy would.
+        run_child('/', dict(base_env, JINJA_CACHE_DIR=shared_cache))
+
+        scenarios = {'cold': '0', 'warm-up': '1', 'shared cache': '1'}
+        results = {name: {} for name in scenarios}
+        for route in PUBLIC_ROUTES + ADMIN_ROUTES:
+            for name, warmup in scenarios.items():
+                samples = []
+                for _ in range(args.runs):
+                    if name == 'shared cache':
+                        cache_dir = shared_cache
+                    else:
+                        cache_dir = tempfile.mkdtemp(dir=workdir)
+                    env = dict(base_env, JINJA_CACHE_DIR=cache_dir, TEMPLATE_WARMUP=warmup)
+                    samples.append(run_child(route, env))
+                results[name][route] = samples
+
+        header = f"{'route':<18}" + ''.join(f"{name + ' boot/ttfb':>26}" for name in scenarios)
+        print(header)
+        print('-' * len(header))
+        for route in PUBLIC_ROUTES + ADMIN_ROUTES:
+            row = f'{route:<18}'
+            for name in scenarios:
+                samples = results[name][route]
+                boot = statistics.median(s['boot'] for s in samples) * 1000
+                ttfb = statistics.median(s['ttfb'] for s in samples) * 1000
+                row += f'{boot:>16.0f} / {ttfb:>4.0f} ms'
+            print(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""One-time database bootstrap: schema, default admin and seed rows.
+
+Public GET handlers only ever read; everything that has to exist before the
+site can serve traffic is created here instead. Run ``flask --app main
+bootstrap`` once per deploy; the development server in ``main.py`` runs it
+itself. Nothing here happens when a worker imports the app.
+"""
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from flask import Blueprint, current_app
+from werkzeug.security import generate_password_hash
+
+from app import db
+from models import Admin, Content, Service, SiteSettings
+from ordering import ORDER_GAP, respace_all
+from search import ensure_search_index
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+bp = Blueprint('bootstrap', __name__, cli_group=None)
+
+
+DEFAULT_CONTENT = {
+    'home': "We specialize in <span class='fw-bold text-success'>professional</span> <span class='fw-bold text-primary'>furniture</span> <span class='fw-bold text-warning'>installation</span> services for homes and offices, including <span class='fw-bold text-info'>modular furniture</span>, <span class='fw-bold text-danger'>workstations</span>, <span class='fw-bold text-success'>kitchen units</span>, and more. Our experienced technicians ensure <span class='fw-bold text-primary'>precise</span>, <span class='fw-bold text-success'>safe</span>, and <span class='fw-bold text-warning'>fast</span> installations using <span class='fw-bold text-info'>advanced tools</span>, helping you enjoy your space without hassle, all at <span class='fw-bold text-dark'>affordable</span> prices.",
+    'about': "At MTS Furnitech, we are dedicated to providing <span class='fw-bold text-success'>professional</span> furniture installation services that transform your space efficiently and affordably. Our experienced team specializes in both office and home furniture installations, ensuring every piece is assembled with precision and care. We understand that your time is valuable, which is why we focus on <span class='fw-bold text-primary'>fast</span>, reliable service without compromising on quality. From modular workstations to custom kitchen units, we handle every installation with the expertise and attention to detail that your furniture deserves."
+}
+
+DEFAULT_SERVICES = {
+    'office': [
+        "Modular Furniture Installation",
+        "Executive Office Desk Installation",
+        "Reception Desk Installation",
+        "Modular Conference Table Installation",
+        "Modular Cabin Table Installation",
+        "Wardrobe Installation",
+        "Cabinet Installation",
+        "Office Workstation Installation"
+    ],
+    'home': [
+        "Bed Installation",
+        "Bedroom Wardrobe Installation",
+        "TV Unit Installation",
+        "Modular Kitchen Installation"
+    ],
+}
+
+SERVICE_DESCRIPTIONS = {
+    'office': "Professional {} service with experienced technicians and quality tools.",
+    'home': "Expert {} service for your home with precision and care.",
+}
+
+
+def default_site_settings():
+    """Return an unsaved SiteSettings carrying the column defaults."""
+    values = {}
+    for column in SiteSettings.__table__.columns:
+        if column.default is not None and column.default.is_scalar:
+            values[column.key] = column.default.arg
+    return SiteSettings(**values)
+
+
+def default_content(section):
+    """Return an unsaved Content row with the built-in text for ``section``."""
+    return Content(section=section, content=DEFAULT_CONTENT.get(section, ''))
+
+
+@contextmanager
+def _bootstrap_lock():
+    # Several gunicorn workers may start at once; serialise them so only one
+    # of them seeds an empty database.
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    with open(os.path.join(current_app.instance_path, 'bootstrap.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _commit_or_rollback():
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another node seeded the same rows first.
+        db.session.rollback()
+
+
+def seed_admin():
+    if not Admin.query.first():
+        db.session.add(Admin(
+            username='admin',
+            password_hash=generate_password_hash('admin123')
+        ))
+        _commit_or_rollback()
+        print("Default admin created - username: admin, password: admin123")
+
+
+def seed_site_settings():
+    if not SiteSettings.query.first():
+        db.session.add(default_site_settings())
+        _commit_or_rollback()
+
+
+def seed_content():
+    existing = {section for (section,) in db.session.query(Content.section)}
+    for section in DEFAULT_CONTENT:
+        if section not in existing:
+            db.session.add(default_content(section))
+    _commit_or_rollback()
+
+
+def seed_services():
+    if Service.query.first() is not None:
+        return
+    for category, titles in DEFAULT_SERVICES.items():
+        for i, title in enumerate(titles):
+            db.session.add(Service(
+                title=title,
+                description=SERVICE_DESCRIPTIONS[category].format(title.lower()),
+                category=category,
+                order_index=(i + 1) * ORDER_GAP
+            ))
+    _commit_or_rollback()
+
+
+def ensure_columns():
+    # Same story for nullable columns added to existing models: add them in
+    # place so older databases keep working without a migration tool.
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def ensure_service_order():
+    # Older databases numbered services 0, 1, 2... by count and may hold
+    # duplicates, which would keep the unique position index from building.
+    respace_all()
+    # Always end the transaction: on PostgreSQL its lock on ``service`` would
+    # block the ALTER TABLE in ensure_search_index.
+    db.session.commit()
+
+
+def ensure_indexes():
+    # create_all() skips tables that already exist, so indexes added to the
+    # models later would never reach databases created before them.
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def bootstrap_database():
+    """Create the schema and seed rows. Safe to run repeatedly."""
+    with _bootstrap_lock():
+        db.create_all()
+        ensure_columns()
+        ensure_service_order()
+        ensure_indexes()
+        ensure_search_index()
+        seed_admin()
+        seed_site_settings()
+        seed_content()
+        seed_services()
+
+
+@bp.cli.command('bootstrap')
+def bootstrap_command():
+    """Create database tables and seed default data."""
+    bootstrap_database()
+    print("Database bootstrap complete.")
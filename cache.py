@@ -0,0 +1,178 @@
+"""In-process read-through cache for rarely changing site data.
+
+Every worker keeps its own copy of the cached values. Admin writes call
+``bump()`` which touches a small version file per namespace inside the
+instance folder; other workers stat those files at most once every
+``CACHE_VERSION_CHECK_INTERVAL`` seconds and drop entries that were loaded
+under an older version, so a stale worker catches up within that bound.
+
+``cached_page`` builds on the same versions to keep whole rendered public
+pages, answering conditional requests with 304 without touching the
+database or the template engine.
+"""
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from types import SimpleNamespace
+
+from flask import Response, current_app, g, request, session
+
+import assets
+
+_lock = threading.Lock()
+_entries = {}     # (namespace, key) -> (version, expires_at, value)
+_pages = {}       # path -> CachedPage
+_versions = {}    # namespace -> version file mtime (ns)
+_last_check = 0.0
+
+
+def _version_dir():
+    return current_app.config.get('CACHE_VERSION_DIR') or os.path.join(current_app.instance_path, 'cache')
+
+
+def _version_path(namespace):
+    return os.path.join(_version_dir(), f'{namespace}.version')
+
+
+def _read_version(namespace):
+    try:
+        return os.stat(_version_path(namespace)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _refresh_versions():
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check < current_app.config.get('CACHE_VERSION_CHECK_INTERVAL', 2):
+        return
+    _last_check = now
+    for namespace in list(_versions):
+        _versions[namespace] = _read_version(namespace)
+
+
+def version(namespace):
+    """Return the current version token for a namespace."""
+    with _lock:
+        _refresh_versions()
+        if namespace not in _versions:
+            _versions[namespace] = _read_version(namespace)
+        return _versions[namespace]
+
+
+def cached(namespace, key, loader, ttl=None):
+    """Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+    Entries expire after ``ttl`` seconds (``CACHE_TTL`` by default) or as
+    soon as the namespace version changes, whichever comes first.
+    """
+    current = version(namespace)
+    entry = _entries.get((namespace, key))
+    if entry and entry[0] == current and entry[1] > time.monotonic():
+        return entry[2]
+
+    value = loader()
+    if ttl is None:
+        ttl = current_app.config.get('CACHE_TTL', 300)
+    # bump() iterates the dicts under the lock, from background threads too.
+    with _lock:
+        _entries[(namespace, key)] = (current, time.monotonic() + ttl, value)
+    return value
+
+
+def bump(*namespaces):
+    """Invalidate the given namespaces in this and every other worker."""
+    directory = _version_dir()
+    os.makedirs(directory, exist_ok=True)
+    now = time.time_ns()
+    with _lock:
+        for namespace in namespaces:
+            path = _version_path(namespace)
+            with open(path, 'a'):
+                pass
+            os.utime(path, ns=(now, now))
+            _versions[namespace] = _read_version(namespace)
+            for key in [k for k in _entries if k[0] == namespace]:
+                _entries.pop(key, None)
+        for key in [k for k, page in _pages.items() if set(page.namespaces) & set(namespaces)]:
+            _pages.pop(key, None)
+
+
+def clear():
+    """Drop every cached entry and page held by this worker."""
+    with _lock:
+        _entries.clear()
+        _pages.clear()
+        _versions.clear()
+
+
+def note_last_modified(timestamp):
+    """Record that the page being rendered depends on data changed at ``timestamp``."""
+    if timestamp is not None and (g.get('last_modified') is None or timestamp > g.last_modified):
+        g.last_modified = timestamp
+
+
+class CachedPage:
+    __slots__ = ('namespaces', 'versions', 'body', 'etag', 'last_modified')
+
+    def __init__(self, namespaces, versions, body, last_modified):
+        self.namespaces = namespaces
+        self.versions = versions
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = last_modified
+
+    def response(self):
+        response = Response(self.body, mimetype='text/html')
+        response.set_etag(self.etag)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+def cached_page(*namespaces):
+    """Cache the rendered output of a public GET view.
+
+    The page is keyed by path alone (the public views ignore the query
+    string, and keying on it would let arbitrary URLs grow the cache) and
+    is only reused while every namespace it depends on is still at the
+    version it was rendered under, and while the asset build it links to
+    is still the current one. Requests carrying pending flash messages always render fresh,
+    since those are shown once and must not leak into the shared copy.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            versions = (*(version(namespace) for namespace in namespaces), assets.manifest_version())
+            key = request.path
+            page = _pages.get(key)
+            if page is not None and page.versions == versions:
+                return page.response()
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.mimetype != 'text/html' or '_flashes' in session:
+                return response
+
+            page = CachedPage(namespaces, versions, response.get_data(), g.get('last_modified'))
+            with _lock:
+                _pages[key] = page
+            return page.response()
+        return wrapper
+    return decorator
+
+
+def freeze(row):
+    """Copy the column values of a model instance into a detached snapshot.
+
+    Cached values outlive the request's database session, so they must not
+    be ORM instances that would try to lazy-load after being detached.
+    """
+    if row is None:
+        return None
+    return SimpleNamespace(**{column.key: getattr(row, column.key) for column in row.__table__.columns})
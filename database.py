@@ -0,0 +1,81 @@
+"""Database engine profiles.
+
+``DB_PROFILE=tuned`` (the default) picks settings per backend:
+
+* SQLite: WAL journal, ``synchronous=NORMAL``, a busy timeout instead of
+  immediate "database is locked" errors, and a larger page cache and mmap
+  window, applied to every new connection.
+* PostgreSQL: a sized connection pool without a pre-ping round-trip on
+  every checkout, server-side statement and idle-transaction timeouts, and
+  optional prepared statements when running on psycopg 3.
+
+``DB_PROFILE=basic`` keeps the original ``pool_recycle``/``pool_pre_ping``
+settings, which is mainly useful for comparing the two. Every knob can be
+overridden through the environment variables read below.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas():
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'cache_size': -_env_int('SQLITE_CACHE_SIZE_KB', 20000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+        'temp_store': 'MEMORY',
+    }
+
+
+def engine_options(database_url, profile=None):
+    """Return ``SQLALCHEMY_ENGINE_OPTIONS`` for ``database_url``."""
+    profile = profile or os.environ.get('DB_PROFILE', 'tuned')
+    if profile == 'basic':
+        return {
+            'pool_recycle': 300,
+            'pool_pre_ping': True,
+        }
+
+    if database_url.startswith('sqlite'):
+        return {}
+
+    options = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1',
+        # LIFO lets surplus connections sit idle long enough to be recycled.
+        'pool_use_lifo': True,
+    }
+    if database_url.startswith('postgresql'):
+        server_options = ' '.join([
+            f"-c statement_timeout={_env_int('DB_STATEMENT_TIMEOUT_MS', 10000)}",
+            f"-c idle_in_transaction_session_timeout={_env_int('DB_IDLE_IN_TRANSACTION_TIMEOUT_MS', 30000)}",
+        ])
+        connect_args = {'options': server_options}
+        if database_url.startswith('postgresql+psycopg:') and 'DB_PREPARE_THRESHOLD' in os.environ:
+            # psycopg 3 prepares a statement server-side after it has run
+            # this many times on a connection; psycopg2 has no equivalent.
+            connect_args['prepare_threshold'] = _env_int('DB_PREPARE_THRESHOLD', 5)
+        options['connect_args'] = connect_args
+    return options
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if type(dbapi_connection).__module__.split('.')[0] not in ('sqlite3', 'pysqlite2'):
+        return
+    if os.environ.get('DB_PROFILE', 'tuned') == 'basic':
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in sqlite_pragmas().items():
+        cursor.execute(f'PRAGMA {pragma}={value}')
+    cursor.close()
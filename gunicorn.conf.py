@@ -0,0 +1,19 @@
+"""gunicorn settings: ``gunicorn main:app`` picks this file up automatically.
+
+The app is imported once in the master and forked into the workers, so they
+start in milliseconds and share the imported modules and compiled templates
+copy-on-write. This is safe because building the app opens no database
+connections; run ``flask --app main bootstrap`` before starting the server.
+
+A sync worker cannot report to the master while it streams a response, so
+``timeout`` also caps how long a message export may take to download.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+reuse_port = True
+
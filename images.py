@@ -0,0 +1,219 @@
+"""Responsive variants for uploaded service photos.
+
+Phone-camera uploads are several megabytes each, far more than a service
+card needs. After an upload is saved, a small thread pool re-encodes it into
+EXIF-free width variants (JPEG, WebP and, where Pillow supports it, AVIF)
+plus a thumbnail, and records the result in ``Service.image_variants`` so the
+templates can emit ``srcset``/``sizes``. Pillow is optional; without it the
+original upload is served as before, and it is only imported once the first
+variant is generated.
+
+The description also carries a ``lqip``: a 16px WebP of a few hundred bytes,
+inlined as the card's blurred background while the real image loads lazily.
+Services without a photo get ``placeholder_svg()``, rendered here rather
+than fetched from a placeholder service.
+"""
+import base64
+import functools
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from flask import Blueprint, current_app
+from markupsafe import escape
+
+import cache
+from app import db
+from models import Service
+from storage import get_storage, upload_url
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+THUMBNAIL_WIDTH = 160
+LQIP_WIDTH = 16
+RASTER_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+FORMATS = {
+    'image/avif': ('avif', 'AVIF', {'quality': 50}),
+    'image/webp': ('webp', 'WEBP', {'quality': 75, 'method': 4}),
+    'image/jpeg': ('jpg', 'JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+bp = Blueprint('images', __name__, cli_group=None)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('IMAGE_WORKERS', 2)),
+                               thread_name_prefix='image-variants')
+
+
+def _pillow():
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:  # pragma: no cover - Pillow is optional
+        return None
+    return Image, ImageOps, features
+
+
+def _enabled_formats(features):
+    formats = dict(FORMATS)
+    if not features.check('avif'):
+        formats.pop('image/avif')
+    return formats
+
+
+def _lqip(image):
+    tiny = image.copy()
+    tiny.thumbnail((LQIP_WIDTH, LQIP_WIDTH))
+    encoded = io.BytesIO()
+    tiny.save(encoded, 'WEBP', quality=40)
+    return 'data:image/webp;base64,' + base64.b64encode(encoded.getvalue()).decode()
+
+
+def generate_lqip(image_path):
+    """Return the ``lqip`` data URI for a stored raster image, or None without Pillow."""
+    pillow = _pillow()
+    if pillow is None:
+        return None
+    Image, ImageOps, _ = pillow
+    with get_storage().open(image_path) as source, Image.open(source) as original:
+        return _lqip(ImageOps.exif_transpose(original).convert('RGB'))
+
+
+def generate_variants(image_path):
+    """Store the variants for the upload ``image_path`` and describe them.
+
+    Returns ``{}`` for files that cannot be resized (SVG, or Pillow missing)
+    so callers can tell "nothing to do" apart from "not generated yet".
+    """
+    extension = image_path.rsplit('.', 1)[-1].lower()
+    pillow = _pillow()
+    if pillow is None or extension not in RASTER_EXTENSIONS:
+        return {}
+    Image, ImageOps, features = pillow
+
+    storage = get_storage()
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+
+    def store(key, image, pil_format, **options):
+        encoded = io.BytesIO()
+        image.save(encoded, pil_format, **options)
+        encoded.seek(0)
+        storage.save(key, encoded)
+        return key
+
+    with storage.open(image_path) as source, Image.open(source) as original:
+        # Bake the camera orientation into the pixels; EXIF is not copied.
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    widths = sorted({*(w for w in VARIANT_WIDTHS if w < image.width), min(image.width, VARIANT_WIDTHS[-1])})
+    formats = _enabled_formats(features)
+    sources = {mimetype: [] for mimetype in formats}
+    for width in widths:
+        # One resize per width, encoded in every format.
+        resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for mimetype, (extension, pil_format, options) in formats.items():
+            key = store(f'uploads/variants/{stem}-{width}.{extension}', resized, pil_format, **options)
+            sources[mimetype].append([width, key])
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 2))
+    thumbnail_key = store(f'uploads/variants/{stem}-thumb.webp', thumbnail, 'WEBP', quality=70)
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'sources': sources,
+        'fallback': sources['image/jpeg'][-1][1],
+        'thumbnail': thumbnail_key,
+        'lqip': _lqip(image),
+    }
+
+
+def _build_variants(flask_app, service_id, image_path):
+    with flask_app.app_context():
+        try:
+            variants = generate_variants(image_path)
+        except Exception:
+            logger.exception("Could not generate image variants for %s", image_path)
+            variants = {}
+
+        service = db.session.get(Service, service_id)
+        # Skip the write if the image was replaced while we were working.
+        if service is not None and service.image_path == image_path:
+            service.image_variants = variants
+            db.session.commit()
+            cache.bump('services')
+
+
+def known_variants(image_path):
+    """Return variants already generated for ``image_path`` by another service."""
+    return db.session.execute(
+        db.select(Service.image_variants)
+        .where(Service.image_path == image_path, Service.image_variants.isnot(None))
+        .limit(1)
+    ).scalar()
+
+
+def schedule_variants(service):
+    """Generate variants for ``service.image_path`` off the request thread."""
+    if service.image_path:
+        _executor.submit(_build_variants, current_app._get_current_object(), service.id, service.image_path)
+
+
+@bp.app_template_global()
+def srcset(variants, mimetype):
+    """Render a ``srcset`` attribute value for one format of ``variants``."""
+    return ', '.join(f"{upload_url(path)} {width}w" for width, path in variants['sources'].get(mimetype, ()))
+
+
+@bp.app_template_global()
+@functools.lru_cache(maxsize=256)
+def blur_placeholder(lqip, width, height):
+    """Wrap a ``lqip`` data URI in a blurred SVG of the image's aspect ratio."""
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}">'
+        f'<filter id="b" color-interpolation-filters="sRGB"><feGaussianBlur stdDeviation="{max(width, height) // 40}"/></filter>'
+        f'<image filter="url(#b)" href="{lqip}" width="{width}" height="{height}" preserveAspectRatio="none"/></svg>'
+    )
+    return 'data:image/svg+xml,' + quote(svg)
+
+
+@bp.app_template_global()
+@functools.lru_cache(maxsize=32)
+def placeholder_svg(label, width=400, height=300):
+    """A data URI for a plain labelled placeholder; no request is made for it."""
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}">'
+        f'<rect width="{width}" height="{height}" fill="#f8f9fa"/>'
+        f'<text x="50%" y="50%" fill="#6c757d" font-family="system-ui, sans-serif" font-size="{height // 12}" '
+        f'text-anchor="middle" dominant-baseline="middle">{escape(label)}</text></svg>'
+    )
+    return 'data:image/svg+xml,' + quote(svg)
+
+
+@bp.cli.command('rebuild-images')
+def rebuild_images_command():
+    """Generate missing image variants and placeholders for every service."""
+    pending = Service.query.filter(Service.image_path.isnot(None), Service.image_variants.is_(None)).all()
+    for service in pending:
+        _build_variants(current_app._get_current_object(), service.id, service.image_path)
+    print(f"Generated variants for {len(pending)} service image(s).")
+
+    # Variants made before placeholders existed only need the lqip added.
+    missing = [service for service in Service.query.filter(Service.image_variants.isnot(None))
+               if service.image_variants.get('sources') and 'lqip' not in service.image_variants]
+    added = 0
+    for service in missing:
+        try:
+            lqip = generate_lqip(service.image_variants['fallback'])
+        except Exception:
+            logger.exception("Could not generate a placeholder for %s", service.image_path)
+            continue
+        if lqip is not None:
+            service.image_variants = dict(service.image_variants, lqip=lqip)
+            added += 1
+    if added:
+        db.session.commit()
+        cache.bump('services')
+    print(f"Added placeholders for {added} service image(s).")
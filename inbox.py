@@ -0,0 +1,272 @@
+"""Queries behind the admin message inbox.
+
+Pages are fetched with keyset pagination on ``(created_at, id)`` so that
+page N costs the same as page 1 no matter how many leads have piled up; the
+cursor is the last row of the previous page, never an OFFSET.
+
+Exports stream every matching row as CSV or JSONL. Rows are plain tuples
+read through a server-side cursor ``EXPORT_BATCH`` at a time (``yield_per``)
+and never become ORM objects, so memory stays flat with millions of rows.
+"""
+import csv
+import io
+import json
+import re
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, delete, insert, or_, update
+
+import cache
+import search
+from app import db
+from models import ArchivedMessage, ContactMessage, Service
+
+MESSAGES_PER_PAGE = 25
+SEARCH_RESULTS = 100
+COUNTS_TTL = 30
+EXPORT_BATCH = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_COLUMNS = ('id', 'name', 'phone', 'service_interest', 'message', 'is_read', 'created_at')
+# Spreadsheet apps run cells starting with these as formulas; contact messages come from the public.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Phone numbers start with '+' too. Digits, spaces, + - ( ) alone cannot call a
+# function, so such values are exported as they are.
+PHONE_SHAPED = re.compile(r'[0-9 +\-()]+')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    return f'{message.created_at.isoformat()}_{message.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, message_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+def message_filters(args):
+    """Translate the inbox filters (status, phone, service) in ``args`` to SQL."""
+    conditions = []
+    status = args.get('status')
+    if status == 'unread':
+        conditions.append(ContactMessage.is_read.is_(False))
+    elif status == 'read':
+        conditions.append(ContactMessage.is_read.is_(True))
+    phone = (args.get('phone') or '').strip()
+    if phone:
+        conditions.append(ContactMessage.phone.contains(phone, autoescape=True))
+    service = (args.get('service') or '').strip()
+    if service:
+        conditions.append(ContactMessage.service_interest.icontains(service, autoescape=True))
+    return conditions
+
+
+def filtered_messages(args):
+    return ContactMessage.query.filter(*message_filters(args))
+
+
+def message_page(args):
+    """Return ``(messages, next_cursor)`` for one page of the filtered inbox.
+
+    With a search term in ``q`` the best ``SEARCH_RESULTS`` matches come
+    back in rank order instead, on a single page.
+    """
+    if (args.get('q') or '').strip():
+        return search.search_messages(args['q'], message_filters(args), limit=SEARCH_RESULTS), None
+
+    query = filtered_messages(args)
+    if args.get('before'):
+        created_at, message_id = decode_cursor(args['before'])
+        query = query.filter(or_(
+            ContactMessage.created_at < created_at,
+            and_(ContactMessage.created_at == created_at, ContactMessage.id < message_id),
+        ))
+
+    messages = (query
+                .order_by(ContactMessage.created_at.desc(), ContactMessage.id.desc())
+                .limit(MESSAGES_PER_PAGE + 1)
+                .all())
+    if len(messages) > MESSAGES_PER_PAGE:
+        messages = messages[:MESSAGES_PER_PAGE]
+        return messages, encode_cursor(messages[-1])
+    return messages, None
+
+
+class EmptySelection(ValueError):
+    pass
+
+
+def bulk_condition(form):
+    """Build the WHERE clause for a bulk action.
+
+    Either explicit ``message_ids`` or an ``older_than_days`` cut-off of at
+    least one day must be given, optionally narrowed by the usual inbox
+    filters; a bare request never selects the whole table, and neither does
+    a cut-off of 0 days.
+    """
+    ids = [int(value) for value in form.getlist('message_ids') if value.isdigit()]
+    days = form.get('older_than_days', '')
+    if ids:
+        conditions = [ContactMessage.id.in_(ids)]
+    elif days.isdigit() and int(days) >= 1:
+        conditions = [ContactMessage.created_at < datetime.utcnow() - timedelta(days=int(days))]
+    else:
+        raise EmptySelection()
+    return and_(*conditions, *message_filters(form))
+
+
+def mark_read(condition):
+    return db.session.execute(
+        update(ContactMessage).where(condition).values(is_read=True),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+
+
+def delete_messages(condition):
+    return db.session.execute(
+        delete(ContactMessage).where(condition),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+
+
+ARCHIVED_COLUMNS = ('name', 'phone', 'service_interest', 'message', 'is_read', 'created_at')
+
+
+def archive_messages(condition):
+    """Move matching messages into contact_message_archive.
+
+    The copy and the delete run in the caller's transaction, so a message
+    is never in both tables or in neither.
+    """
+    db.session.execute(insert(ArchivedMessage).from_select(
+        ('message_id',) + ARCHIVED_COLUMNS,
+        db.select(ContactMessage.id, *(getattr(ContactMessage, column) for column in ARCHIVED_COLUMNS))
+        .where(condition),
+    ))
+    return delete_messages(condition)
+
+
+BULK_ACTIONS = {
+    'read': (mark_read, 'marked as read'),
+    'delete': (delete_messages, 'deleted'),
+    'archive': (archive_messages, 'archived'),
+}
+
+
+def date_filters(args):
+    """Conditions for the inclusive ``from``/``to`` dates (YYYY-MM-DD) in ``args``."""
+    conditions = []
+    try:
+        if args.get('from'):
+            start = datetime.combine(date.fromisoformat(args['from']), time.min)
+            conditions.append(ContactMessage.created_at >= start)
+        if args.get('to'):
+            end = datetime.combine(date.fromisoformat(args['to']) + timedelta(days=1), time.min)
+            conditions.append(ContactMessage.created_at < end)
+    except ValueError:
+        raise InvalidFilter(args.get('from'), args.get('to'))
+    return conditions
+
+
+def export_rows(args):
+    """Return an iterator over ``EXPORT_COLUMNS`` tuples of the matching messages, oldest first.
+
+    The filters are checked here, before anything is streamed, so a bad date
+    can still be answered with a 400.
+    """
+    statement = (
+        db.select(*(getattr(ContactMessage, column) for column in EXPORT_COLUMNS))
+        .where(*message_filters(args), *date_filters(args))
+        .order_by(ContactMessage.created_at, ContactMessage.id)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+
+    def rows():
+        yield from db.session.execute(statement)
+    return rows()
+
+
+def _chunked(lines):
+    """Join small pieces into ``EXPORT_CHUNK_SIZE`` chunks, one socket write each."""
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PHONE_SHAPED.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def export_csv(rows):
+    """Stream ``rows`` as CSV with a header line."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def lines():
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([_csv_cell(value) for value in row])
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+    return _chunked(lines())
+
+
+def export_jsonl(rows):
+    """Stream ``rows`` as one JSON object per line."""
+    return _chunked(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + '\n' for row in rows)
+
+
+def message_to_dict(message):
+    return {
+        'id': message.id,
+        'name': message.name,
+        'phone': message.phone,
+        'service_interest': message.service_interest,
+        'message': message.message,
+        'is_read': message.is_read,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def _load_message_counts():
+    total, unread = db.session.execute(
+        db.select(db.func.count(ContactMessage.id),
+                  db.func.count(ContactMessage.id).filter(ContactMessage.is_read.is_(False)))
+    ).one()
+    return {'total': total, 'unread': unread}
+
+
+def message_counts():
+    """Total/unread counters for the dashboard.
+
+    Both come from one aggregate query over ``contact_message``, cached in
+    the ``messages`` namespace. Admin actions bump it straight away, and so
+    does the contact flusher each time it moves a batch of submissions into
+    the inbox. ``COUNTS_TTL`` bounds how stale the counters can get from
+    writes that do not bump it.
+    """
+    return cache.cached('messages', 'counts', _load_message_counts, ttl=COUNTS_TTL)
+
+
+def service_count():
+    return cache.cached('services', 'count', lambda: db.session.scalar(db.select(db.func.count(Service.id))))
@@ -0,0 +1,207 @@
+"""Buffered, rate-limited ingestion for the public contact form.
+
+A submission is validated, checked against per-IP and per-phone token
+buckets, and appended to a small SQLite staging database in the instance
+folder (WAL mode, so appends do not contend with each other). A background
+thread in each worker, started by its first request, moves staged rows into
+``contact_message`` in batches, turning a burst of N submissions into a
+handful of commits on the main database instead of N.
+
+Rows are removed from the staging table only after the main database has
+committed them, so a crash can at worst deliver a batch twice, never lose
+it. The token buckets are per worker: with W workers a client can get at
+most W times the configured rate.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import Blueprint, current_app
+
+import cache
+from app import db
+from models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('ingest', __name__, cli_group=None)
+
+FIELD_LIMITS = {'name': 100, 'phone': 20, 'service_interest': 100, 'message': 5000}
+
+
+class TokenBucket:
+    """Allow ``capacity`` events per key, refilled at ``rate`` tokens/second."""
+
+    def __init__(self, capacity, rate, max_keys=10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Re-inserting keeps the dict in least-recently-seen order, so the
+            # oldest keys are the ones dropped once max_keys is reached.
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+class StagingQueue:
+    """Append-only SQLite table used as a durable local queue."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def put(self, payload):
+        self._connection().execute('INSERT INTO pending (payload) VALUES (?)', (json.dumps(payload),))
+
+    def drain(self, handler, batch_size):
+        """Pass up to ``batch_size`` staged payloads to ``handler`` and drop them.
+
+        The staging write lock is held until ``handler`` returns, so two
+        workers never deliver the same rows.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute('SELECT id, payload FROM pending ORDER BY id LIMIT ?', (batch_size,)).fetchall()
+            if rows:
+                handler([json.loads(payload) for _, payload in rows])
+                connection.execute('DELETE FROM pending WHERE id <= ?', (rows[-1][0],))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+
+_ip_buckets = None
+_phone_buckets = None
+_queue = None
+_flusher = None
+_setup_lock = threading.Lock()
+
+
+def _setup():
+    global _ip_buckets, _phone_buckets, _queue
+    config = current_app.config
+    with _setup_lock:
+        if _queue is None:
+            _ip_buckets = TokenBucket(config['CONTACT_RATE_BURST'], config['CONTACT_RATE_PER_MINUTE'] / 60)
+            _phone_buckets = TokenBucket(config['CONTACT_RATE_BURST'], config['CONTACT_RATE_PER_MINUTE'] / 60)
+            _queue = StagingQueue(config.get('CONTACT_QUEUE_PATH') or os.path.join(current_app.instance_path, 'contact_queue.db'))
+
+
+def validate(form):
+    """Return ``(fields, error)`` for a contact form submission."""
+    fields = {key: (form.get(key) or '').strip() for key in FIELD_LIMITS}
+    if not all(fields.values()):
+        return None, 'Please fill in all fields.'
+    for key, limit in FIELD_LIMITS.items():
+        if len(fields[key]) > limit:
+            return None, f"{key.replace('_', ' ').capitalize()} is too long."
+    if not all(ch.isdigit() or ch in '+- ()' for ch in fields['phone']):
+        return None, 'Please enter a valid phone number.'
+    return fields, None
+
+
+def allow(remote_addr, phone):
+    """Charge one token from both the client's and the phone number's bucket."""
+    _setup()
+    client = remote_addr or 'unknown'
+    digits = ''.join(ch for ch in phone if ch.isdigit())
+    # Evaluate both so a blocked phone also costs the client a token. A phone
+    # without digits is keyed by the client rather than one bucket shared by all.
+    ip_ok = _ip_buckets.allow(client)
+    phone_ok = _phone_buckets.allow(digits or client)
+    return ip_ok and phone_ok
+
+
+def enqueue(fields):
+    """Stage a validated submission; it reaches the inbox on the next flush."""
+    _setup()
+    _queue.put(dict(fields, created_at=datetime.utcnow().isoformat()))
+
+
+def _insert_messages(payloads):
+    for payload in payloads:
+        payload['created_at'] = datetime.fromisoformat(payload['created_at'])
+    db.session.execute(db.insert(ContactMessage), payloads)
+    db.session.commit()
+
+
+def flush():
+    """Move everything currently staged into the main database."""
+    _setup()
+    batch_size = current_app.config['CONTACT_FLUSH_BATCH']
+    total = 0
+    try:
+        while True:
+            moved = _queue.drain(_insert_messages, batch_size)
+            total += moved
+            if moved < batch_size:
+                break
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+    if total:
+        cache.bump('messages')
+    return total
+
+
+def _run_flusher(flask_app):
+    while True:
+        time.sleep(flask_app.config['CONTACT_FLUSH_INTERVAL'])
+        with flask_app.app_context():
+            try:
+                flush()
+            except Exception:
+                logger.exception("Could not flush staged contact messages; will retry")
+
+
+@bp.before_app_request
+def _start_flusher():
+    # Started per worker by its first request: a thread started in a preloaded
+    # master does not survive the fork. Rows staged before a restart are then
+    # delivered without waiting for the next submission.
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        with _setup_lock:
+            if _flusher is None or not _flusher.is_alive():
+                _flusher = threading.Thread(target=_run_flusher, args=(current_app._get_current_object(),),
+                                            name='contact-flusher', daemon=True)
+                _flusher.start()
+
+
+@bp.cli.command('flush-contacts')
+def flush_contacts_command():
+    """Move staged contact form submissions into the inbox now."""
+    print(f"Flushed {flush()} staged contact message(s).")
@@ -1,4 +1,12 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The development server bootstraps the database itself; deployments run
+    # `flask --app main bootstrap` once before starting gunicorn.
+    from bootstrap import bootstrap_database
+
+    with app.app_context():
+        bootstrap_database()
+    app.run(host='0.0.0.0', port=5000, debug=app.debug)
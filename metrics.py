@@ -0,0 +1,290 @@
+"""Per-request timing and SQL instrumentation.
+
+Every request records wall time, template render time, the number and
+total time of SQL statements (via SQLAlchemy engine events) and the response
+size, aggregated per endpoint into latency histograms. Requests slower than
+``SLOW_REQUEST_MS`` are logged together with their slowest statements and
+any statement repeated often enough to look like an N+1 loop.
+
+Each gunicorn worker keeps its own counters and writes them to
+``instance/metrics/<pid>.json`` every few seconds; the exporters merge those
+files so ``/metrics`` reports the whole server no matter which worker
+answers the scrape. The totals of a worker that has exited are folded into
+``retired.json``, so recycling workers never makes a counter go backwards.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from flask import Blueprint, before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DUMP_INTERVAL = 5
+SLOW_QUERIES_SHOWN = 5
+RETIRED = 'retired.json'
+
+bp = Blueprint('metrics', __name__)
+
+_lock = threading.Lock()
+_stats = {}
+_slow_requests = deque(maxlen=50)
+_last_dump = 0.0
+
+
+def _new_stats():
+    return {'count': 0, 'buckets': [0] * len(BUCKETS), 'duration': 0.0, 'queries': 0,
+            'sql_time': 0.0, 'render_time': 0.0, 'bytes': 0, 'statuses': {}}
+
+
+@bp.before_app_request
+def _start_request():
+    g.request_metrics = {'start': time.perf_counter(), 'queries': [], 'render_time': 0.0, 'render_start': []}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    current = g.get('request_metrics') if has_app_context() else None
+    if current is not None:
+        current['queries'].append((elapsed, statement))
+
+
+@before_render_template.connect
+def _before_render(sender, template, context, **extra):
+    current = g.get('request_metrics')
+    if current is not None:
+        current['render_start'].append(time.perf_counter())
+
+
+@template_rendered.connect
+def _after_render(sender, template, context, **extra):
+    current = g.get('request_metrics')
+    if current is not None and current['render_start']:
+        current['render_time'] += time.perf_counter() - current['render_start'].pop()
+
+
+@bp.after_app_request
+def _note_response(response):
+    current = g.get('request_metrics')
+    if current is not None:
+        current['status'] = response.status_code
+        current['bytes'] = response.content_length or 0
+    return response
+
+
+@bp.teardown_app_request
+def _finish_request(error=None):
+    # Teardown also runs for a request whose exception escaped every handler,
+    # where no after_request function sees a response; it counts as a 500.
+    current = g.pop('request_metrics', None)
+    if current is None:
+        return
+    duration = time.perf_counter() - current['start']
+    endpoint = request.endpoint or 'unmatched'
+    queries = current['queries']
+    sql_time = sum(elapsed for elapsed, _ in queries)
+
+    with _lock:
+        stats = _stats.setdefault(endpoint, _new_stats())
+        stats['count'] += 1
+        stats['duration'] += duration
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                stats['buckets'][i] += 1
+        stats['queries'] += len(queries)
+        stats['sql_time'] += sql_time
+        stats['render_time'] += current['render_time']
+        stats['bytes'] += current.get('bytes', 0)
+        status = str(current.get('status', 500))
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    if duration * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+        _record_slow_request(endpoint, duration, current['render_time'], queries)
+    _maybe_dump()
+
+
+def _record_slow_request(endpoint, duration, render_time, queries):
+    slowest = sorted(queries, reverse=True)[:SLOW_QUERIES_SHOWN]
+    repeated = [(statement, count) for statement, count in Counter(s for _, s in queries).most_common(3) if count > 1]
+    entry = {
+        'time': time.time(),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': endpoint,
+        'duration': duration,
+        'render_time': render_time,
+        'query_count': len(queries),
+        'sql_time': sum(elapsed for elapsed, _ in queries),
+        'slowest': [(elapsed, ' '.join(statement.split())) for elapsed, statement in slowest],
+        'repeated': [(' '.join(statement.split()), count) for statement, count in repeated],
+    }
+    _slow_requests.append(entry)
+    logger.warning(
+        "Slow request %s %s: %.0f ms (render %.0f ms, %d queries in %.0f ms)%s%s",
+        entry['method'], entry['path'], duration * 1000, render_time * 1000,
+        entry['query_count'], entry['sql_time'] * 1000,
+        ''.join(f"\n  {elapsed * 1000:.1f} ms: {statement}" for elapsed, statement in entry['slowest']),
+        ''.join(f"\n  repeated {count}x: {statement}" for statement, count in entry['repeated']),
+    )
+
+
+def _metrics_dir():
+    return os.path.join(current_app.instance_path, 'metrics')
+
+
+def _maybe_dump(force=False):
+    global _last_dump
+    now = time.monotonic()
+    if not force and now - _last_dump < DUMP_INTERVAL:
+        return
+    _last_dump = now
+    with _lock:
+        payload = json.dumps({'stats': _stats, 'slow': list(_slow_requests)})
+    directory = _metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as out:
+        out.write(payload)
+    os.replace(path + '.tmp', path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    # Serialises scrapes in different workers, so a dead worker's file is
+    # folded into the retired totals exactly once and never read half-folded.
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(merged, stats):
+    for endpoint, endpoint_stats in stats.items():
+        total = merged.setdefault(endpoint, _new_stats())
+        for key in ('count', 'duration', 'queries', 'sql_time', 'render_time', 'bytes'):
+            total[key] += endpoint_stats[key]
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], endpoint_stats['buckets'])]
+        for status, count in endpoint_stats['statuses'].items():
+            total['statuses'][status] = total['statuses'].get(status, 0) + count
+
+
+def _retire(directory, name):
+    """Fold the counters of the exited worker in ``name`` into the retired totals."""
+    path = os.path.join(directory, name)
+    data = _load(path)
+    if data is not None:
+        retired = _load(os.path.join(directory, RETIRED)) or {'stats': {}, 'slow': []}
+        _merge(retired['stats'], data['stats'])
+        slow = sorted(retired['slow'] + data['slow'], key=lambda entry: entry['time'])
+        retired['slow'] = slow[-_slow_requests.maxlen:]
+        retired_path = os.path.join(directory, RETIRED)
+        with open(retired_path + '.tmp', 'w') as out:
+            json.dump(retired, out)
+        os.replace(retired_path + '.tmp', retired_path)
+    os.unlink(path)
+
+
+def snapshot():
+    """Return ``(stats per endpoint, slow requests)`` merged across workers, past and present."""
+    _maybe_dump(force=True)
+    merged = {}
+    slow = []
+    directory = _metrics_dir()
+    with _directory_lock(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json') and name != RETIRED and not _pid_alive(int(name[:-5])):
+                _retire(directory, name)
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            data = _load(os.path.join(directory, name))
+            if data is None:
+                continue
+            slow.extend(data['slow'])
+            _merge(merged, data['stats'])
+    slow.sort(key=lambda entry: entry['time'], reverse=True)
+    return merged, slow
+
+
+def quantile(stats, q):
+    """Estimate a latency quantile (seconds) from the histogram buckets."""
+    if not stats['count']:
+        return 0.0
+    target = q * stats['count']
+    for bound, count in zip(BUCKETS, stats['buckets']):
+        if count >= target:
+            return bound
+    return float('inf')
+
+
+def render_prometheus():
+    stats, _ = snapshot()
+    lines = [
+        '# HELP http_request_duration_seconds Request wall time.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for endpoint, s in sorted(stats.items()):
+        for bound, count in zip(BUCKETS, s['buckets']):
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {s["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {s["duration"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {s["count"]}')
+
+    counters = (
+        ('http_requests_total', 'Requests by endpoint and status.', None),
+        ('http_request_sql_queries_total', 'SQL statements executed.', 'queries'),
+        ('http_request_sql_seconds_total', 'Time spent in SQL statements.', 'sql_time'),
+        ('http_request_render_seconds_total', 'Time spent rendering templates.', 'render_time'),
+        ('http_response_bytes_total', 'Response body bytes before compression.', 'bytes'),
+    )
+    for name, help_text, key in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for endpoint, s in sorted(stats.items()):
+            if key is None:
+                for status, count in sorted(s['statuses'].items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}",status="{status}"}} {count}')
+            else:
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {s[key]}')
+    return '\n'.join(lines) + '\n'
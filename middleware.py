@@ -0,0 +1,151 @@
+"""WSGI middleware for response compression and cache headers.
+
+``CompressionMiddleware`` gzip- or brotli-encodes text responses (HTML,
+CSS, JS, JSON, SVG) for clients that accept it. It only touches buffered
+responses with a known ``Content-Length`` of at least ``min_size`` bytes, so
+streamed bodies and bodies that are already encoded (the precompressed
+files in ``static/dist``) pass through untouched. A compressed body is a
+different representation, so its ``ETag`` is made weak; Werkzeug's
+conditional handling compares ``If-None-Match`` weakly, so revalidation
+keeps answering 304.
+
+``CachePolicyMiddleware`` fills in ``Cache-Control`` per route class:
+
+* admin pages and ``/metrics`` are ``private, no-store``;
+* uploads (``/media/`` and the legacy ``/static/uploads/``) named by their
+  content digest never change and are ``immutable``, older uploads get a day;
+* public pages without their own policy must revalidate, and are kept out
+  of shared caches when the response sets a cookie.
+"""
+import re
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+MAX_BUFFERED = 8 * 1024 * 1024
+DIGEST_NAME = re.compile(r'/[0-9a-f]{32}(-\d+|-thumb)?\.\w+$')
+
+
+def _compressible(headers):
+    mimetype = headers.get('Content-Type', '').split(';')[0].strip()
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers, value):
+    vary = [item.strip() for item in headers.get('Vary', '').split(',') if item.strip()]
+    if value.lower() not in (item.lower() for item in vary):
+        vary.append(value)
+    headers['Vary'] = ', '.join(vary)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def _negotiate(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        options = [('gzip', accepted['gzip'])]
+        if brotli is not None:
+            options.insert(0, ('br', accepted['br']))
+        encoding, quality = max(options, key=lambda option: option[1])
+        return encoding if quality > 0 else None
+
+    def _should_compress(self, environ, status, headers):
+        if environ['REQUEST_METHOD'] == 'HEAD' or not status.startswith('200'):
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        length = headers.get('Content-Length', type=int)
+        return length is not None and self.min_size <= length <= MAX_BUFFERED
+
+    def _compress(self, encoding, body):
+        if encoding == 'br':
+            # Quality 11 is for build-time assets; 5 is the usual on-the-fly setting.
+            return brotli.compress(body, quality=5)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+
+    def __call__(self, environ, start_response):
+        encoding = self._negotiate(environ)
+        deferred = []
+
+        def capture(status, response_headers, exc_info=None):
+            headers = Headers(response_headers)
+            if _compressible(headers):
+                _add_vary(headers, 'Accept-Encoding')
+            elif status.startswith('304') and encoding:
+                # A 304 has no Content-Type; repeat what the 200 would have sent.
+                _add_vary(headers, 'Accept-Encoding')
+                etag = headers.get('ETag')
+                if etag and 'W/' + etag in environ.get('HTTP_IF_NONE_MATCH', ''):
+                    headers['ETag'] = 'W/' + etag
+            if encoding and _compressible(headers) and self._should_compress(environ, status, headers):
+                deferred.append((status, headers))
+                return lambda data: None  # pragma: no cover - Flask never uses write()
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, capture)
+        if not deferred:
+            return app_iter
+
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        status, headers = deferred[0]
+        compressed = self._compress(encoding, body)
+        if len(compressed) >= len(body):
+            start_response(status, headers.to_wsgi_list())
+            return [body]
+
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(compressed))
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+        start_response(status, headers.to_wsgi_list())
+        return [compressed]
+
+
+class CachePolicyMiddleware:
+    def __init__(self, app, upload_prefixes=('/media/', '/static/uploads/')):
+        self.app = app
+        self.upload_prefixes = upload_prefixes
+
+    def policy(self, path, status, headers):
+        if path.startswith('/admin') or path == '/metrics':
+            return 'private, no-store'
+        # Redirects to presigned storage URLs carry their own, short, policy.
+        if path.startswith(self.upload_prefixes) and status[:3] in ('200', '304'):
+            if DIGEST_NAME.search(path):
+                return 'public, max-age=31536000, immutable'
+            return 'public, max-age=86400'
+        if path.startswith('/static/'):
+            return None
+        if 'Cache-Control' in headers:
+            return None
+        if 'Set-Cookie' in headers:
+            return 'private, no-cache'
+        return 'public, no-cache'
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+
+        def apply_policy(status, response_headers, exc_info=None):
+            headers = Headers(response_headers)
+            policy = self.policy(path, status, headers)
+            if policy:
+                headers['Cache-Control'] = policy
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        return self.app(environ, apply_policy)
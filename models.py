@@ -23,10 +23,16 @@ class Service(db.Model):
     description = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(20), nullable=False)  # 'office' or 'home'
     image_path = db.Column(db.String(200))
-    order_index = db.Column(db.Integer, default=0)
+    image_variants = db.Column(db.JSON(none_as_null=True))  # filled in by images.py after upload
+    order_index = db.Column(db.Integer)  # sparse position within the category, see ordering.py
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_service_category_active_order', 'category', 'is_active', 'order_index'),
+        db.Index('uq_service_category_order', 'category', 'order_index', unique=True),
+    )
+
 
 class ContactMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -37,6 +43,25 @@ class ContactMessage(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_contact_message_created', 'created_at', 'id'),
+        db.Index('ix_contact_message_read_created', 'is_read', 'created_at', 'id'),
+    )
+
+
+class ArchivedMessage(db.Model):
+    __tablename__ = 'contact_message_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, nullable=False, index=True)  # id it had in contact_message
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    service_interest = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 
 class SiteSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
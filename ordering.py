@@ -0,0 +1,196 @@
+"""Position of services within their category.
+
+``Service.order_index`` is a sparse key: services are numbered ``ORDER_GAP``
+apart, and a (category, order_index) unique index keeps two services from
+ever sharing a position. Moving a service gives it a key halfway between its
+new neighbours, so a drag-and-drop move rewrites one row. Only when a gap is
+used up is the category renumbered, and then only the rows whose key changes
+are written.
+
+A new service is placed after the last one with a key computed inside its
+INSERT. On SQLite the statement holds the write lock, so concurrent adds
+cannot pick the same key. On PostgreSQL one of two racing adds fails on the
+unique index instead of silently sharing a position, and ``commit_placed``
+places it again after the winner.
+"""
+from bisect import bisect_left
+
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Service
+
+ORDER_GAP = 1024
+
+
+class InvalidOrder(ValueError):
+    pass
+
+
+class StaleOrder(Exception):
+    """The submitted ids are not the category's current services (one was added or removed)."""
+
+
+class OrderConflict(Exception):
+    """A concurrent change took the position this one was placed at, twice in a row."""
+
+
+def is_order_conflict(error):
+    """Whether the ``IntegrityError`` ``error`` comes from the (category, order_index) unique index."""
+    # PostgreSQL names the index; SQLite names its columns.
+    message = str(error.orig)
+    return 'uq_service_category_order' in message or 'service.category, service.order_index' in message
+
+
+def next_order_index(category):
+    """SQL expression for the key after the last service in ``category``."""
+    return (
+        db.select(func.coalesce(func.max(Service.order_index), 0) + ORDER_GAP)
+        .where(Service.category == category)
+        .scalar_subquery()
+    )
+
+
+def place_last(service):
+    """Move ``service`` to the end of its category when it is next flushed."""
+    service.order_index = next_order_index(service.category)
+
+
+def commit_placed(apply):
+    """Call ``apply()``, which stages a change using ``place_last``, commit, and return its result.
+
+    If the commit fails on the (category, order_index) unique index the
+    session is rolled back and the change applied and committed once more; a
+    second failure raises ``OrderConflict``. Other integrity errors are
+    re-raised as they are. The session is rolled back in either case.
+    """
+    for attempt in range(2):
+        try:
+            result = apply()
+            db.session.commit()
+            return result
+        except IntegrityError as error:
+            db.session.rollback()
+            if not is_order_conflict(error):
+                raise
+            if attempt:
+                raise OrderConflict() from error
+
+
+def _kept_positions(keys):
+    """Positions of a longest strictly increasing run in ``keys``: the rows that need not move."""
+    tails, tail_positions, previous = [], [], [None] * len(keys)
+    for position, key in enumerate(keys):
+        slot = bisect_left(tails, key)
+        if slot == len(tails):
+            tails.append(key)
+            tail_positions.append(position)
+        else:
+            tails[slot] = key
+            tail_positions[slot] = position
+        previous[position] = tail_positions[slot - 1] if slot else None
+    kept = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        kept.add(position)
+        position = previous[position]
+    return kept
+
+
+def _sparse_keys(keys):
+    """New keys for ``keys`` (current keys in the wanted order), or None if a gap ran out."""
+    kept = _kept_positions(keys)
+    result = list(keys)
+    position = 0
+    while position < len(keys):
+        if position in kept:
+            position += 1
+            continue
+        end = position
+        while end < len(keys) and end not in kept:
+            end += 1
+        count = end - position
+        low = result[position - 1] if position else None
+        high = keys[end] if end < len(keys) else None
+        if low is None and high is None:
+            return None
+        if low is None:
+            low = high - (count + 1) * ORDER_GAP
+        if high is None:
+            high = low + (count + 1) * ORDER_GAP
+        step = (high - low) // (count + 1)
+        if step < 1:
+            return None
+        for offset in range(count):
+            result[position + offset] = low + step * (offset + 1)
+        position = end
+    return result
+
+
+def _write(changes):
+    """Apply ``{service id: order_index}`` in one UPDATE."""
+    if len(changes) > 1:
+        # Rows checked one at a time would trip the unique index when two
+        # swap keys, so park them first; the index ignores NULLs.
+        db.session.execute(update(Service).where(Service.id.in_(changes)).values(order_index=None))
+    db.session.execute(
+        update(Service)
+        .where(Service.id.in_(changes))
+        .values(order_index=case(changes, value=Service.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reorder(category, ids):
+    """Put the services of ``category`` in the order of ``ids`` and return how many rows changed.
+
+    ``ids`` must list every service of the category exactly once; a list
+    made from a page that is out of date raises ``StaleOrder``. The caller
+    commits.
+    """
+    try:
+        ids = [int(service_id) for service_id in ids]
+    except (TypeError, ValueError):
+        raise InvalidOrder(ids)
+    if len(set(ids)) != len(ids):
+        raise InvalidOrder(ids)
+    current = dict(db.session.execute(
+        db.select(Service.id, Service.order_index).where(Service.category == category).with_for_update()
+    ).all())
+    if set(ids) != set(current):
+        raise StaleOrder(category)
+
+    keys = [current[service_id] for service_id in ids]
+    if None in keys or len(set(keys)) != len(keys):
+        new_keys = None
+    else:
+        new_keys = _sparse_keys(keys)
+    if new_keys is None:
+        new_keys = [(position + 1) * ORDER_GAP for position in range(len(ids))]
+    changes = {service_id: key for service_id, key, old in zip(ids, new_keys, keys) if key != old}
+    if changes:
+        _write(changes)
+    return len(changes)
+
+
+def respace_all():
+    """Renumber every category that has shared or missing keys; returns how many rows changed.
+
+    Databases from before the unique index may hold duplicates, which would
+    keep the index from being created.
+    """
+    changed = 0
+    categories = db.session.execute(
+        db.select(Service.category)
+        .group_by(Service.category)
+        .having((func.count(Service.order_index) < func.count()) |
+                (func.count(func.distinct(Service.order_index)) < func.count()))
+    ).scalars().all()
+    for category in categories:
+        ids = db.session.execute(
+            db.select(Service.id).where(Service.category == category)
+            .order_by(Service.order_index.is_(None), Service.order_index, Service.id)
+        ).scalars().all()
+        changed += reorder(category, ids)
+    return changed
@@ -1,18 +1,60 @@
-import os
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
-from app import app, db
+from sqlalchemy.exc import IntegrityError
+from app import db
+import assets
+import cache
+import images
+import inbox
+import ingest
+import metrics
+import ordering
+import search
+import sessions
+import storage
+import uploads
+from bootstrap import default_content, default_site_settings
 from models import Admin, Content, Service, ContactMessage, SiteSettings
 from datetime import datetime
 
+public = Blueprint('public', __name__)
+admin = Blueprint('admin', __name__, url_prefix='/admin')
+
+ORDER_CONFLICT = 'Another service was added to this category at the same time. Please try again.'
+STALE_ORDER = 'The services changed since the page was loaded; reload and try again.'
+
 
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_site_settings():
+def save_image_upload(field):
+    """Store the image posted in ``field`` and return its static path, or None."""
+    file = request.files.get(field)
+    if not file or not file.filename or file.filename.strip() == '':
+        return None
+    if not allowed_file(file.filename):
+        flash('File type not allowed. Please use JPG, PNG, GIF, SVG, or WebP images.', 'error')
+        return None
+
+    try:
+        return uploads.save_upload(file, current_app.config['MAX_CONTENT_LENGTH'])
+    except uploads.UploadTooLarge:
+        flash('File too large. Maximum size is 5MB.', 'error')
+    except OSError as e:
+        flash(f'Error uploading image: {str(e)}', 'error')
+    return None
+
+
+def set_service_image(service, image_path):
+    if image_path and image_path != service.image_path:
+        service.image_path = image_path
+        # Identical photos share one content-addressed file, and its variants.
+        service.image_variants = images.known_variants(image_path)
+
+
+def get_site_settings_row():
     settings = SiteSettings.query.first()
     if not settings:
         settings = SiteSettings()
@@ -21,74 +63,57 @@ def get_site_settings():
     return settings
 
 
+def get_site_settings():
+    settings = cache.cached('settings', 'site', lambda: cache.freeze(SiteSettings.query.first() or default_site_settings()))
+    cache.note_last_modified(settings.updated_at)
+    return settings
+
+
 def get_content(section):
-    content = Content.query.filter_by(section=section).first()
-    if not content:
-        default_content = {
-            'home': "We specialize in <span class='fw-bold text-success'>professional</span> <span class='fw-bold text-primary'>furniture</span> <span class='fw-bold text-warning'>installation</span> services for homes and offices, including <span class='fw-bold text-info'>modular furniture</span>, <span class='fw-bold text-danger'>workstations</span>, <span class='fw-bold text-success'>kitchen units</span>, and more. Our experienced technicians ensure <span class='fw-bold text-primary'>precise</span>, <span class='fw-bold text-success'>safe</span>, and <span class='fw-bold text-warning'>fast</span> installations using <span class='fw-bold text-info'>advanced tools</span>, helping you enjoy your space without hassle, all at <span class='fw-bold text-dark'>affordable</span> prices.",
-            'about': "At MTS Furnitech, we are dedicated to providing <span class='fw-bold text-success'>professional</span> furniture installation services that transform your space efficiently and affordably. Our experienced team specializes in both office and home furniture installations, ensuring every piece is assembled with precision and care. We understand that your time is valuable, which is why we focus on <span class='fw-bold text-primary'>fast</span>, reliable service without compromising on quality. From modular workstations to custom kitchen units, we handle every installation with the expertise and attention to detail that your furniture deserves."
-        }
-        content = Content(section=section, content=default_content.get(section, ''))
-        db.session.add(content)
-        db.session.commit()
+    content = cache.cached('content', section, lambda: cache.freeze(get_content_row(section)))
+    cache.note_last_modified(content.updated_at)
     return content
 
 
-def init_default_services():
-    if Service.query.count() == 0:
-        office_services = [
-            "Modular Furniture Installation",
-            "Executive Office Desk Installation", 
-            "Reception Desk Installation",
-            "Modular Conference Table Installation",
-            "Modular Cabin Table Installation",
-            "Wardrobe Installation",
-            "Cabinet Installation",
-            "Office Workstation Installation"
-        ]
-        
-        home_services = [
-            "Bed Installation",
-            "Bedroom Wardrobe Installation",
-            "TV Unit Installation",
-            "Modular Kitchen Installation"
-        ]
-        
-        for i, service in enumerate(office_services):
-            s = Service(
-                title=service,
-                description=f"Professional {service.lower()} service with experienced technicians and quality tools.",
-                category='office',
-                order_index=i
-            )
-            db.session.add(s)
-        
-        for i, service in enumerate(home_services):
-            s = Service(
-                title=service,
-                description=f"Expert {service.lower()} service for your home with precision and care.",
-                category='home',
-                order_index=i
-            )
-            db.session.add(s)
-        
-        db.session.commit()
+def get_content_row(section):
+    return Content.query.filter_by(section=section).first() or default_content(section)
+
+
+def get_service_catalog():
+    return cache.cached('services', 'catalog', load_service_catalog)
+
 
+def load_service_catalog():
+    # One ordered scan over ix_service_category_active_order, grouped here
+    # rather than issuing a query per category. Plain rows keep the catalog
+    # immutable and skip the ORM identity map.
+    catalog = {}
+    active_services = db.session.execute(
+        db.select(*Service.__table__.columns)
+        .filter_by(is_active=True)
+        .order_by(Service.category, Service.is_active, Service.order_index)
+    )
+    for service in active_services:
+        catalog.setdefault(service.category, []).append(service)
+    return {category: tuple(items) for category, items in catalog.items()}
 
-@app.route('/')
+
+@public.route('/')
+@cache.cached_page('settings', 'content')
 def index():
     settings = get_site_settings()
     content = get_content('home')
     return render_template('index.html', settings=settings, content=content)
 
 
-@app.route('/services')
+@public.route('/services')
+@cache.cached_page('settings', 'services')
 def services():
     settings = get_site_settings()
-    init_default_services()
+    catalog = get_service_catalog()
     
-    office_services = Service.query.filter_by(category='office', is_active=True).order_by(Service.order_index).all()
-    home_services = Service.query.filter_by(category='home', is_active=True).order_by(Service.order_index).all()
+    office_services = catalog.get('office', ())
+    home_services = catalog.get('home', ())
     
     return render_template('services.html', 
                          settings=settings, 
@@ -96,41 +121,66 @@ def services():
                          home_services=home_services)
 
 
-@app.route('/about')
+@public.route('/services/search')
+def service_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return redirect(url_for('public.services'))
+    return render_template('services.html', settings=get_site_settings(), query=query,
+                           results=search.search_services(query))
+
+
+@public.route('/api/services/search')
+def service_search_api():
+    results = search.search_services(request.args.get('q', ''))
+    return jsonify({'results': [{
+        'id': service.id,
+        'title': service.title,
+        'description': service.description,
+        'category': service.category,
+        'url': url_for('public.service_search', q=service.title),
+    } for service in results]})
+
+
+@public.route('/about')
+@cache.cached_page('settings', 'content')
 def about():
     settings = get_site_settings()
     content = get_content('about')
     return render_template('about.html', settings=settings, content=content)
 
 
-@app.route('/contact', methods=['GET', 'POST'])
+@public.route('/contact', methods=['GET', 'POST'])
+@cache.cached_page('settings')
 def contact():
     settings = get_site_settings()
     
     if request.method == 'POST':
-        name = request.form.get('name')
-        phone = request.form.get('phone')
-        service_interest = request.form.get('service_interest')
-        message = request.form.get('message')
-        
-        if name and phone and service_interest and message:
-            contact_msg = ContactMessage(
-                name=name,
-                phone=phone,
-                service_interest=service_interest,
-                message=message
-            )
-            db.session.add(contact_msg)
-            db.session.commit()
-            flash('Your message has been sent successfully! We will contact you soon.', 'success')
-            return redirect(url_for('contact'))
+        fields, error = ingest.validate(request.form)
+        if error:
+            flash(error, 'error')
+        elif not ingest.allow(request.remote_addr, fields['phone']):
+            flash('Too many messages sent. Please wait a few minutes and try again.', 'error')
+            return render_template('contact.html', settings=settings), 429
         else:
-            flash('Please fill in all fields.', 'error')
+            ingest.enqueue(fields)
+            flash('Your message has been sent successfully! We will contact you soon.', 'success')
+            return redirect(url_for('public.contact'))
     
     return render_template('contact.html', settings=settings)
 
 
-@app.route('/admin/login', methods=['GET', 'POST'])
+@public.route('/static/dist/<path:filename>')
+def asset(filename):
+    return assets.send_asset(filename)
+
+
+@public.route('/media/<path:key>')
+def media(key):
+    return storage.send_upload(key)
+
+
+@admin.route('/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -138,52 +188,49 @@ def admin_login():
         
         admin = Admin.query.filter_by(username=username).first()
         if admin and check_password_hash(admin.password_hash, password):
-            session['admin_id'] = admin.id
-            session['admin_username'] = admin.username
+            sessions.login(admin)
             flash('Login successful!', 'success')
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('admin.admin_dashboard'))
         else:
             flash('Invalid username or password.', 'error')
     
     return render_template('admin/login.html')
 
 
-@app.route('/admin/logout')
+@admin.route('/logout')
 def admin_logout():
-    session.pop('admin_id', None)
+    sessions.logout()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('admin_login'))
+    return redirect(url_for('admin.admin_login'))
 
 
 def admin_required(f):
     def decorated_function(*args, **kwargs):
-        if 'admin_id' not in session:
+        if sessions.current_admin() is None:
             flash('Please log in to access the admin panel.', 'error')
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('admin.admin_login'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
 
-@app.route('/admin')
+@admin.route('')
 @admin_required
 def admin_dashboard():
     settings = get_site_settings()
-    message_count = ContactMessage.query.count()
-    unread_count = ContactMessage.query.filter_by(is_read=False).count()
-    service_count = Service.query.count()
+    counts = inbox.message_counts()
     
     return render_template('admin/dashboard.html', 
                          settings=settings,
-                         message_count=message_count,
-                         unread_count=unread_count,
-                         service_count=service_count)
+                         message_count=counts['total'],
+                         unread_count=counts['unread'],
+                         service_count=inbox.service_count())
 
 
-@app.route('/admin/content', methods=['GET', 'POST'])
+@admin.route('/content', methods=['GET', 'POST'])
 @admin_required
 def admin_content():
-    settings = get_site_settings()
+    settings = get_site_settings_row()
     
     if request.method == 'POST':
         section = request.form.get('section')
@@ -199,20 +246,18 @@ def admin_content():
                 db.session.add(content)
             
             db.session.commit()
+            cache.bump('content')
             flash(f'{section.title()} content updated successfully!', 'success')
         
         # Handle logo upload
-        if 'logo' in request.files:
-            file = request.files['logo']
-            if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file.save(file_path)
-                
-                settings.logo_path = f'uploads/{filename}'
-                db.session.commit()
-                flash('Logo updated successfully!', 'success')
+        logo_path = save_image_upload('logo')
+        if logo_path:
+            old_logo_path = settings.logo_path
+            settings.logo_path = logo_path
+            db.session.commit()
+            cache.bump('settings')
+            uploads.release([old_logo_path])
+            flash('Logo updated successfully!', 'success')
         
         # Handle contact information updates
         phone_number = request.form.get('phone_number')
@@ -231,6 +276,7 @@ def admin_content():
             
         if phone_number or email or whatsapp_number or address:
             db.session.commit()
+            cache.bump('settings')
             flash('Contact information updated successfully!', 'success')
     
     home_content = get_content('home')
@@ -242,7 +288,7 @@ def admin_content():
                          about_content=about_content)
 
 
-@app.route('/admin/services', methods=['GET', 'POST'])
+@admin.route('/services', methods=['GET', 'POST'])
 @admin_required
 def admin_services():
     settings = get_site_settings()
@@ -256,127 +302,98 @@ def admin_services():
             category = request.form.get('category')
             
             if title and description and category:
-                service = Service(
-                    title=title,
-                    description=description,
-                    category=category,
-                    order_index=Service.query.filter_by(category=category).count()
-                )
+                image_path = save_image_upload('image')
                 
-                # Handle image upload
-                if 'image' in request.files:
-                    file = request.files['image']
-                    print(f"DEBUG ADD: File received: {file.filename if file else 'None'}")
-                    print(f"DEBUG ADD: File size: {len(file.read()) if file else 0} bytes")
-                    file.seek(0)  # Reset file pointer after reading
-                    
-                    if file and file.filename and file.filename.strip() != '':
-                        print(f"DEBUG ADD: Checking file extension for: {file.filename}")
-                        if allowed_file(file.filename):
-                            # Check file size for better performance
-                            file_size = len(file.read())
-                            file.seek(0)  # Reset file pointer
-                            
-                            if file_size > 5 * 1024 * 1024:  # 5MB limit
-                                flash('File too large. Maximum size is 5MB.', 'error')
-                            else:
-                                filename = secure_filename(file.filename)
-                                # Add timestamp to filename to avoid conflicts
-                                timestamp = str(int(datetime.now().timestamp()))
-                                name, ext = os.path.splitext(filename)
-                                filename = f"{name}_{timestamp}{ext}"
-                                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                                
-                                # Ensure upload directory exists
-                                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                                print(f"DEBUG ADD: Saving file to: {file_path}")
-                                
-                                try:
-                                    file.save(file_path)
-                                    service.image_path = f'uploads/{filename}'
-                                    print(f"DEBUG ADD: Image path set to: {service.image_path}")
-                                    print(f"DEBUG ADD: File saved successfully")
-                                except Exception as e:
-                                    print(f"DEBUG ADD: Error saving file: {str(e)}")
-                                    flash(f'Error uploading image: {str(e)}', 'error')
-                        else:
-                            print(f"DEBUG ADD: File not allowed: {file.filename}")
-                            flash('File type not allowed. Please use JPG, PNG, GIF, SVG, or WebP images.', 'error')
-                    else:
-                        print("DEBUG ADD: No file selected or empty filename")
+                def add():
+                    service = Service(
+                        title=title,
+                        description=description,
+                        category=category
+                    )
+                    ordering.place_last(service)
+                    set_service_image(service, image_path)
+                    db.session.add(service)
+                    return service
                 
-                db.session.add(service)
-                db.session.commit()
+                try:
+                    service = ordering.commit_placed(add)
+                except ordering.OrderConflict:
+                    flash(ORDER_CONFLICT, 'error')
+                    return redirect(url_for('admin.admin_services'))
+                cache.bump('services')
+                if service.image_path and service.image_variants is None:
+                    images.schedule_variants(service)
                 flash('Service added successfully!', 'success')
-                return redirect(url_for('admin_services'))
+                return redirect(url_for('admin.admin_services'))
         
         elif action == 'edit':
             service_id = request.form.get('service_id')
             service = Service.query.get_or_404(service_id)
+            old_keys = uploads.service_keys(service)
+            image_path = save_image_upload('image')
             
-            service.title = request.form.get('title')
-            service.description = request.form.get('description')
-            service.category = request.form.get('category')
+            def edit():
+                service.title = request.form.get('title')
+                service.description = request.form.get('description')
+                if request.form.get('category') != service.category:
+                    service.category = request.form.get('category')
+                    ordering.place_last(service)
+                set_service_image(service, image_path)
             
-            # Handle image upload
-            if 'image' in request.files:
-                file = request.files['image']
-                print(f"DEBUG EDIT: File received: {file.filename if file else 'None'}")
-                print(f"DEBUG EDIT: File size: {len(file.read()) if file else 0} bytes")
-                file.seek(0)  # Reset file pointer after reading
-                
-                if file and file.filename and file.filename.strip() != '':
-                    print(f"DEBUG EDIT: Checking file extension for: {file.filename}")
-                    if allowed_file(file.filename):
-                        # Check file size for better performance
-                        file_size = len(file.read())
-                        file.seek(0)  # Reset file pointer
-                        
-                        if file_size > 5 * 1024 * 1024:  # 5MB limit
-                            flash('File too large. Maximum size is 5MB.', 'error')
-                        else:
-                            filename = secure_filename(file.filename)
-                            # Add timestamp to filename to avoid conflicts
-                            timestamp = str(int(datetime.now().timestamp()))
-                            name, ext = os.path.splitext(filename)
-                            filename = f"{name}_{timestamp}{ext}"
-                            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                            
-                            # Ensure upload directory exists
-                            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                            print(f"DEBUG EDIT: Saving file to: {file_path}")
-                            
-                            try:
-                                file.save(file_path)
-                                service.image_path = f'uploads/{filename}'
-                                print(f"DEBUG EDIT: Image path set to: {service.image_path}")
-                                print(f"DEBUG EDIT: File saved successfully")
-                            except Exception as e:
-                                print(f"DEBUG EDIT: Error saving file: {str(e)}")
-                                flash(f'Error uploading image: {str(e)}', 'error')
-                    else:
-                        print(f"DEBUG EDIT: File not allowed: {file.filename}")
-                        flash('File type not allowed. Please use JPG, PNG, GIF, SVG, or WebP images.', 'error')
-                else:
-                    print("DEBUG EDIT: No file selected or empty filename")
-            
-            db.session.commit()
+            try:
+                ordering.commit_placed(edit)
+            except ordering.OrderConflict:
+                flash(ORDER_CONFLICT, 'error')
+                return redirect(url_for('admin.admin_services'))
+            cache.bump('services')
+            uploads.release(old_keys)
+            if service.image_path and service.image_variants is None:
+                images.schedule_variants(service)
             flash('Service updated successfully!', 'success')
-            return redirect(url_for('admin_services'))
+            return redirect(url_for('admin.admin_services'))
         
         elif action == 'delete':
             service_id = request.form.get('service_id')
             service = Service.query.get_or_404(service_id)
+            old_keys = uploads.service_keys(service)
             db.session.delete(service)
             db.session.commit()
+            cache.bump('services')
+            uploads.release(old_keys)
             flash('Service deleted successfully!', 'success')
-            return redirect(url_for('admin_services'))
+            return redirect(url_for('admin.admin_services'))
     
     services = Service.query.order_by(Service.category, Service.order_index).all()
     return render_template('admin/manage_services.html', settings=settings, services=services)
 
 
-@app.route('/admin/change-password', methods=['GET', 'POST'])
+@admin.route('/api/services/reorder', methods=['POST'])
+@admin_required
+def reorder_services_api():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('ids'), list) or not payload.get('category'):
+        abort(400)
+    try:
+        updated = ordering.reorder(payload['category'], payload['ids'])
+    except ordering.InvalidOrder:
+        abort(400)
+    except ordering.StaleOrder:
+        db.session.rollback()
+        return jsonify({'error': STALE_ORDER}), 409
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        # A service placed concurrently took one of the keys just written.
+        db.session.rollback()
+        if not ordering.is_order_conflict(error):
+            raise
+        return jsonify({'error': STALE_ORDER}), 409
+    if updated:
+        cache.bump('services')
+    return jsonify({'updated': updated})
+
+
+@admin.route('/change-password', methods=['GET', 'POST'])
 @admin_required
 def admin_change_password():
     if request.method == 'POST':
@@ -385,10 +402,10 @@ def admin_change_password():
         confirm_password = request.form.get('confirm_password')
         
         # Get current admin
-        admin = Admin.query.filter_by(username=session.get('admin_username')).first()
+        admin = db.session.get(Admin, sessions.current_admin()['id'])
         if not admin:
             flash('Session expired. Please login again.', 'error')
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('admin.admin_login'))
         
         # Validate current password
         if not check_password_hash(admin.password_hash, current_password):
@@ -408,35 +425,113 @@ def admin_change_password():
         # Update password
         admin.password_hash = generate_password_hash(new_password)
         db.session.commit()
+        sessions.password_changed(admin)
         
         flash('Password changed successfully!', 'success')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('admin.admin_dashboard'))
     
     return render_template('admin/change_password.html')
 
 
-@app.route('/admin/messages')
+@admin.route('/messages')
 @admin_required
 def admin_messages():
     settings = get_site_settings()
-    messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).all()
-    return render_template('admin/messages.html', settings=settings, messages=messages)
+    try:
+        messages, next_cursor = inbox.message_page(request.args)
+    except inbox.InvalidCursor:
+        abort(400)
+    filters = {key: request.args[key] for key in ('q', 'status', 'phone', 'service') if request.args.get(key)}
+    return render_template('admin/messages.html', settings=settings, messages=messages,
+                           next_cursor=next_cursor, filters=filters)
 
 
-@app.route('/admin/message/<int:message_id>/read', methods=['POST'])
+@admin.route('/api/messages')
+@admin_required
+def admin_messages_api():
+    try:
+        messages, next_cursor = inbox.message_page(request.args)
+    except inbox.InvalidCursor:
+        abort(400)
+    return jsonify({
+        'messages': [inbox.message_to_dict(message) for message in messages],
+        'next_cursor': next_cursor,
+        'html': render_template('admin/_message_list.html', messages=messages),
+    })
+
+
+@admin.route('/messages/export.<any(csv, jsonl):fmt>')
+@admin_required
+def export_messages(fmt):
+    try:
+        rows = inbox.export_rows(request.args)
+    except inbox.InvalidFilter:
+        abort(400)
+    chunks = inbox.export_csv(rows) if fmt == 'csv' else inbox.export_jsonl(rows)
+    filename = f"messages-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    return Response(stream_with_context(chunks),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@admin.route('/messages/bulk', methods=['POST'])
+@admin_required
+def bulk_messages():
+    action = inbox.BULK_ACTIONS.get(request.form.get('action'))
+    if action is None:
+        abort(400)
+    try:
+        condition = inbox.bulk_condition(request.form)
+    except inbox.EmptySelection:
+        flash('Select some messages or an age cut-off first.', 'error')
+        return redirect(url_for('admin.admin_messages'))
+
+    apply_action, verb = action
+    count = apply_action(condition)
+    db.session.commit()
+    cache.bump('messages')
+    flash(f'{count} message(s) {verb}.', 'success')
+    return redirect(url_for('admin.admin_messages'))
+
+
+@admin.route('/message/<int:message_id>/read', methods=['POST'])
 @admin_required
 def mark_message_read(message_id):
     message = ContactMessage.query.get_or_404(message_id)
     message.is_read = True
     db.session.commit()
-    return redirect(url_for('admin_messages'))
+    cache.bump('messages')
+    return redirect(url_for('admin.admin_messages'))
 
 
-@app.route('/admin/message/<int:message_id>/delete', methods=['POST'])
+@admin.route('/message/<int:message_id>/delete', methods=['POST'])
 @admin_required
 def delete_message(message_id):
     message = ContactMessage.query.get_or_404(message_id)
     db.session.delete(message)
     db.session.commit()
+    cache.bump('messages')
     flash('Message deleted successfully!', 'success')
-    return redirect(url_for('admin_messages'))
+    return redirect(url_for('admin.admin_messages'))
+
+
+@public.route('/metrics')
+def prometheus_metrics():
+    # Scrapers authenticate with METRICS_TOKEN; without one, only a logged-in
+    # admin can read the endpoint.
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif sessions.current_admin() is None:
+        abort(401)
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@admin.route('/metrics')
+@admin_required
+def admin_metrics():
+    stats, slow_requests = metrics.snapshot()
+    endpoints = sorted(stats.items(), key=lambda item: item[1]['duration'], reverse=True)
+    return render_template('admin/metrics.html', endpoints=endpoints, slow_requests=slow_requests[:20],
+                           quantile=metrics.quantile, slow_request_ms=current_app.config['SLOW_REQUEST_MS'])
@@ -0,0 +1,220 @@
+"""Ranked full-text search over services and contact messages.
+
+The index lives in the database and is maintained by the database itself,
+so every write path (ORM edits, the batched contact inserts, bulk deletes and
+archiving) keeps it current without application code:
+
+* SQLite: external-content FTS5 tables (``service_fts``,
+  ``contact_message_fts``) kept in step by AFTER INSERT/UPDATE/DELETE
+  triggers, ranked with ``bm25``.
+* PostgreSQL: a stored generated ``search_vector`` column with a GIN index
+  on each table, ranked with ``ts_rank_cd``.
+
+Titles and names weigh more than descriptions and message bodies. Every
+search term matches as a prefix, so "ward" finds "wardrobe" and the first
+digits of a phone number find the message. Filters such as the inbox's
+status and date range are part of the full-text query. Message search ranks
+only the newest ``MESSAGE_CANDIDATES`` matches that pass them: a word that
+occurs in most of the inbox would otherwise have to be scored in every row.
+Other databases, or SQLite builds without FTS5, fall back to unranked
+``LIKE`` matching.
+
+``ensure_search_index`` creates all of this and is part of
+``flask --app main bootstrap``.
+"""
+import logging
+import re
+
+from sqlalchemy import column, func, inspect, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from models import ContactMessage, Service
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 8
+MAX_QUERY_LENGTH = 100
+MESSAGE_CANDIDATES = 2000
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_INDEXES = {
+    # table: (fts columns, bm25 weights)
+    'service': (('title', 'description'), (10.0, 1.0)),
+    'contact_message': (('name', 'phone', 'service_interest', 'message'), (10.0, 10.0, 4.0, 1.0)),
+}
+
+POSTGRES_VECTORS = {
+    'service': "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+               "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+    'contact_message': "setweight(to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(phone, '')), 'A') || "
+                       "setweight(to_tsvector('english', coalesce(service_interest, '')), 'B') || "
+                       "setweight(to_tsvector('english', coalesce(message, '')), 'C')",
+}
+
+# Text configurations the vectors above were built with. A query term has to be
+# parsed with each: 'english' stems "wardrobes" to "wardrob", 'simple' keeps it.
+# The last one is the stemming configuration; terms it discards as stop words
+# are dropped from the query, as they are for services.
+POSTGRES_QUERY_CONFIGS = {
+    'service': ('english',),
+    'contact_message': ('simple', 'english'),
+}
+
+_backend = None
+
+
+def search_terms(query):
+    """Split free text into at most ``MAX_TERMS`` lower-case word terms."""
+    return [term.lower() for term in _TERM.findall((query or '')[:MAX_QUERY_LENGTH])][:MAX_TERMS]
+
+
+def _sqlite_statements(table, columns):
+    fts = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def ensure_search_index():
+    """Create the search tables/columns, triggers and indexes if missing."""
+    global _backend
+    engine = db.engine
+    existing = set(inspect(engine).get_table_names())
+    if engine.dialect.name == 'sqlite':
+        try:
+            with engine.begin() as connection:
+                for table, (columns, _) in SQLITE_INDEXES.items():
+                    created = f'{table}_fts' not in existing
+                    for statement in _sqlite_statements(table, columns):
+                        connection.execute(text(statement))
+                    if created:
+                        # Index the rows that existed before the triggers did.
+                        connection.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+        except OperationalError:
+            logger.warning("SQLite was built without FTS5; search falls back to LIKE matching")
+    elif engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            for table, vector in POSTGRES_VECTORS.items():
+                connection.execute(text(
+                    f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+                    f'GENERATED ALWAYS AS ({vector}) STORED'
+                ))
+                connection.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (search_vector)'
+                ))
+    _backend = None
+
+
+def backend():
+    """Return 'fts5', 'postgresql' or 'like' for the current database."""
+    global _backend
+    if _backend is None:
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            _backend = 'postgresql'
+        elif dialect == 'sqlite' and 'service_fts' in inspect(db.engine).get_table_names():
+            _backend = 'fts5'
+        else:
+            _backend = 'like'
+    return _backend
+
+
+def _ranked_ids(model, terms, limit, candidates=None, conditions=()):
+    """Ids of the best ``limit`` matches of ``model`` rows meeting ``conditions``, best first.
+
+    The conditions are part of the full-text query, so the limits apply to
+    the rows that pass them. With ``candidates`` only that many of the newest
+    such matches are ranked, which keeps a term that appears in most rows from
+    costing a full scoring pass.
+    """
+    name = model.__tablename__
+    if backend() == 'fts5':
+        columns, weights = SQLITE_INDEXES[name]
+        fts = table(f'{name}_fts', column('rowid'))
+        # Quoting each term keeps FTS5 syntax characters in user input inert.
+        match = text(f'{name}_fts MATCH :match').bindparams(match=' '.join(f'"{term}"*' for term in terms))
+        score = literal_column(f"bm25({name}_fts, {', '.join(map(str, weights))})")
+        source = fts.join(model.__table__, model.id == fts.c.rowid)
+    else:
+        # Every term must match, in any of the configurations its columns use.
+        matches = []
+        params = {}
+        configs = POSTGRES_QUERY_CONFIGS[name]
+        for i, term in enumerate(terms):
+            params[f'term{i}'] = f'{term}:*'
+            stemmed = f"to_tsquery('{configs[-1]}', :term{i})"
+            if len(configs) == 1:
+                matches.append(stemmed)
+            else:
+                alternatives = ' || '.join(f"to_tsquery('{config}', :term{i})" for config in configs)
+                # An empty tsquery drops out of the && below.
+                matches.append(f"(CASE WHEN numnode({stemmed}) = 0 THEN ''::tsquery ELSE {alternatives} END)")
+        query = text(f"({' && '.join(matches)})").bindparams(**params)
+        vector = literal_column(f'{name}.search_vector')
+        match = vector.op('@@')(query)
+        # Evaluated only for the rows the inner LIMIT lets through.
+        score = -func.ts_rank_cd(vector, query)
+        source = model.__table__
+    matching = (
+        db.select(model.id.label('id'), score.label('score'))
+        .select_from(source)
+        .where(match, *conditions)
+        .order_by(model.id.desc())
+        .limit(candidates)
+        .subquery()
+    )
+    statement = db.select(matching.c.id).order_by(matching.c.score, matching.c.id.desc()).limit(limit)
+    return db.session.execute(statement).scalars().all()
+
+
+def _like_conditions(columns, terms):
+    return [or_(*(column.icontains(term, autoescape=True) for column in columns)) for term in terms]
+
+
+def _in_rank_order(model, ids):
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+def search_services(query, limit=20):
+    """Active services matching ``query``, best match first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if backend() == 'like':
+        return (Service.query
+                .filter(Service.is_active.is_(True), *_like_conditions((Service.title, Service.description), terms))
+                .order_by(Service.category, Service.order_index)
+                .limit(limit).all())
+    ids = _ranked_ids(Service, terms, limit, conditions=[Service.is_active.is_(True)])
+    return _in_rank_order(Service, ids)
+
+
+def search_messages(query, conditions=(), limit=100):
+    """Contact messages matching ``query`` and ``conditions``, best match first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if backend() == 'like':
+        columns = (ContactMessage.name, ContactMessage.phone, ContactMessage.service_interest, ContactMessage.message)
+        return (ContactMessage.query
+                .filter(*conditions, *_like_conditions(columns, terms))
+                .order_by(ContactMessage.created_at.desc(), ContactMessage.id.desc())
+                .limit(limit).all())
+    ids = _ranked_ids(ContactMessage, terms, limit, MESSAGE_CANDIDATES, conditions)
+    return _in_rank_order(ContactMessage, ids)
@@ -0,0 +1,268 @@
+"""Server-side sessions and the logged-in admin.
+
+With a server-side backend the session cookie carries only a random id and
+the data lives in a store chosen with ``SESSION_BACKEND``:
+
+* ``memory``: a bounded LRU dict (``SESSION_MAX_ENTRIES``) in this process.
+  Only correct when one process serves every request: ``python main.py``,
+  or gunicorn with ``WEB_CONCURRENCY=1``.
+* ``redis``: any Redis-protocol server (Redis, Valkey, KeyDB, Dragonfly) at
+  ``SESSION_REDIS_URL``, shared by every worker and node. Needs redis-py,
+  which is only imported for this backend.
+* ``cookie``: Flask's signed cookie, the default when no Redis is
+  configured, so multi-worker deployments keep working without one.
+
+Server-side sessions expire ``SESSION_IDLE_TIMEOUT`` seconds after the last
+request (sliding expiry). Loading a session pushes its expiry forward in the
+same step (``GETEX`` on Redis 6.2+), so a request costs one store round
+trip, plus a write only when the session data changed. The cookie is set
+when a session is created or its id rotates, not whenever its contents
+change. The cookie backend gets the same idle timeout from Flask's
+permanent-session refresh.
+
+At login the session receives the admin principal: id, username and a
+fingerprint of the password hash. Admin pages read it from the session
+instead of querying ``Admin``. Each request checks the fingerprint against
+the admin's current one, which is cached per worker in the ``admins`` cache
+namespace. Changing the password bumps that namespace, so every other
+session of that admin is logged out within ``CACHE_VERSION_CHECK_INTERVAL``
+on any backend.
+"""
+import hashlib
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+
+import cache
+from app import db
+from models import Admin
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+
+def secret_key(instance_path):
+    """``SESSION_SECRET``, or a random key generated once and kept in the instance folder.
+
+    Every worker on the node reads the same file, so signed data stays valid
+    across workers and restarts without a hard-coded fallback.
+    """
+    secret = os.environ.get('SESSION_SECRET')
+    if secret:
+        return secret
+    path = os.path.join(instance_path, 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(instance_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=instance_path, prefix='.secret-')
+        with os.fdopen(fd, 'w') as out:
+            out.write(secrets.token_hex(32))
+        try:
+            # link() fails if another worker got there first; theirs wins.
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+    with open(path) as secret_file:
+        return secret_file.read().strip()
+
+
+class MemoryStore:
+    """Serialized sessions in a bounded LRU dict; the least recently used go first."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # sid -> [expires_at, value]
+        self._lock = threading.Lock()
+
+    def load(self, sid, ttl):
+        """Return the value stored for ``sid`` and extend its expiry, or None."""
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            now = time.time()
+            if entry[0] <= now:
+                del self._entries[sid]
+                return None
+            entry[0] = now + ttl
+            self._entries.move_to_end(sid)
+            return entry[1]
+
+    def save(self, sid, value, ttl):
+        with self._lock:
+            self._entries[sid] = [time.time() + ttl, value]
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class RedisStore:
+    """Serialized sessions as expiring keys on a Redis-protocol server."""
+
+    def __init__(self, url, prefix='session:'):
+        if redis is None:
+            raise RuntimeError('SESSION_BACKEND=redis needs redis-py (pip install redis)')
+        if not url:
+            raise RuntimeError('SESSION_BACKEND=redis needs SESSION_REDIS_URL')
+        # The connection pool reconnects after a fork, so preloading is safe.
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def load(self, sid, ttl):
+        """Return the value stored for ``sid`` and extend its expiry, or None."""
+        value = self.client.getex(self.prefix + sid, ex=ttl)
+        return None if value is None else value.decode()
+
+    def save(self, sid, value, ttl):
+        self.client.set(self.prefix + sid, value, ex=ttl)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class CookieSession(SecureCookieSession):
+    def regenerate(self):
+        """Nothing to do: the signed cookie is reissued whenever it changes."""
+
+
+class ServerSideSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.rotate = False
+
+    def regenerate(self):
+        """Move the data to a fresh id at the end of the request (login, logout)."""
+        self.rotate = True
+        self.modified = True
+
+
+class CookieSessionInterface(SecureCookieSessionInterface):
+    session_class = CookieSession
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, idle_timeout):
+        self.store = store
+        self.idle_timeout = idle_timeout
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            value = self.store.load(sid, self.idle_timeout)
+            if value is not None:
+                return ServerSideSession(self.serializer.loads(value), sid=sid)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if session.sid is None or session.rotate:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), self.idle_timeout)
+            # A browser-session cookie: the idle timeout is enforced by the store.
+            response.set_cookie(name, session.sid, domain=domain, path=path, secure=secure,
+                                samesite=samesite, httponly=httponly)
+            response.vary.add('Cookie')
+        elif session.modified:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), self.idle_timeout)
+
+
+def session_interface(flask_app):
+    """Build the session interface selected by ``SESSION_BACKEND``."""
+    config = flask_app.config
+    backend = config['SESSION_BACKEND']
+    if backend == 'cookie':
+        return CookieSessionInterface()
+    if backend == 'memory':
+        store = MemoryStore(config['SESSION_MAX_ENTRIES'])
+    elif backend == 'redis':
+        store = RedisStore(config['SESSION_REDIS_URL'])
+    else:
+        raise RuntimeError(f'unknown SESSION_BACKEND {backend!r}')
+    return ServerSideSessionInterface(store, config['SESSION_IDLE_TIMEOUT'])
+
+
+def _fingerprint(password_hash):
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
+def _current_fingerprint(admin_id):
+    def load():
+        admin = db.session.get(Admin, admin_id)
+        return None if admin is None else _fingerprint(admin.password_hash)
+    return cache.cached('admins', admin_id, load)
+
+
+def login(admin):
+    """Start a fresh session for ``admin``; the old session id is discarded."""
+    session.clear()
+    session.regenerate()
+    session.permanent = True
+    session['admin'] = {'id': admin.id, 'username': admin.username, 'auth': _fingerprint(admin.password_hash)}
+    g.admin = session['admin']
+
+
+def logout():
+    """End the admin session; anything stored afterwards (a flash) gets a new id."""
+    session.clear()
+    session.regenerate()
+    g.admin = None
+
+
+def current_admin():
+    """The logged-in admin's principal (``id``, ``username``), or None.
+
+    Sessions whose password fingerprint is out of date (the password was
+    changed, or the admin deleted) are logged out.
+    """
+    if 'admin' not in g:
+        principal = session.get('admin')
+        if principal is not None and _current_fingerprint(principal['id']) != principal['auth']:
+            session.pop('admin')
+            principal = None
+        g.admin = principal
+    return g.admin
+
+
+def password_changed(admin):
+    """Log out every other session of ``admin``; the current one stays signed in."""
+    cache.bump('admins')
+    principal = session.get('admin')
+    if principal is not None and principal['id'] == admin.id:
+        session['admin'] = dict(principal, auth=_fingerprint(admin.password_hash))
+        g.admin = session['admin']
@@ -222,52 +222,15 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize tooltips for back to top button
     new bootstrap.Tooltip(backToTopButton);
 
-    // Enhanced lazy loading for images with loading indicators
-    const images = document.querySelectorAll('img[data-src], .card-img-top');
-    const imageObserver = new IntersectionObserver((entries) => {
-        entries.forEach(entry => {
-            if (entry.isIntersecting) {
-                const img = entry.target;
-                const container = img.closest('.card-img-container');
-                
-                // Add loading state
-                if (container) {
-                    container.classList.add('loading');
-                }
-                
-                // Create new image for preloading
-                const newImg = new Image();
-                newImg.onload = function() {
-                    img.src = img.dataset.src || img.src;
-                    img.classList.remove('lazy');
-                    img.classList.add('loaded');
-                    if (container) {
-                        container.classList.remove('loading');
-                        container.classList.add('loaded');
-                    }
-                };
-                newImg.onerror = function() {
-                    img.classList.add('error');
-                    if (container) {
-                        container.classList.remove('loading');
-                        container.classList.add('error');
-                    }
-                };
-                
-                // Start loading
-                if (img.dataset.src) {
-                    newImg.src = img.dataset.src;
-                } else {
-                    newImg.src = img.src;
-                }
-                
-                imageObserver.unobserve(img);
-            }
-        });
-    }, { threshold: 0.1, rootMargin: '50px' });
-
-    images.forEach(img => {
-        imageObserver.observe(img);
+    // Card images load natively (loading="lazy"); drop the blurred placeholder
+    // once the real image is in so transparent images do not show it through.
+    document.querySelectorAll('img.lqip').forEach(img => {
+        const clearPlaceholder = () => { img.style.background = 'none'; };
+        if (img.complete && img.naturalWidth) {
+            clearPlaceholder();
+        } else {
+            img.addEventListener('load', clearPlaceholder, { once: true });
+        }
     });
 
     // Service interest auto-selection based on URL parameters
@@ -0,0 +1,250 @@
+"""Storage backends for uploaded files.
+
+An upload is addressed by its key, e.g. ``uploads/<digest>.jpg``: the value
+kept in ``Service.image_path``, ``SiteSettings.logo_path`` and the image
+variant descriptions. ``STORAGE_BACKEND`` picks where the bytes live:
+
+* ``local`` (default): under the static folder (or ``STORAGE_LOCAL_ROOT``).
+  Several app nodes need that directory on a shared volume.
+* ``s3``: a bucket on S3 or any S3-compatible service such as MinIO
+  (``STORAGE_S3_ENDPOINT``), shared by every node. Needs boto3, which is
+  only required when this backend is configured.
+
+Python should not be streaming image bytes. ``upload_url()`` points at
+``STORAGE_PUBLIC_URL`` (a CDN or a public bucket) when it is set. Otherwise
+it points at ``/media/<key>``, which hands the work to the web server: an
+``X-Accel-Redirect`` to ``STORAGE_ACCEL_PREFIX`` for nginx, ``X-Sendfile``
+with ``USE_X_SENDFILE``, or the WSGI file wrapper (``sendfile(2)`` under
+gunicorn). For S3 it redirects to a short-lived presigned URL.
+"""
+import io
+import mimetypes
+import os
+import shutil
+import tempfile
+
+from flask import Blueprint, Response, abort, current_app, redirect, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from middleware import DIGEST_NAME
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - boto3 is optional
+    boto3 = None
+
+UPLOAD_PREFIX = 'uploads/'
+CHUNK_SIZE = 64 * 1024
+
+bp = Blueprint('storage', __name__, cli_group=None)
+
+
+def _content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def _cache_control(key):
+    if DIGEST_NAME.search('/' + key):
+        return 'public, max-age=31536000, immutable'
+    return 'public, max-age=86400'
+
+
+class LocalStorage:
+    """Files in a directory on this machine (or a volume shared between nodes)."""
+
+    def __init__(self, root, accel_prefix=None):
+        self.root = root
+        self.accel_prefix = accel_prefix
+
+    def _path(self, key):
+        path = safe_join(self.root, key)
+        if path is None:
+            raise ValueError(f'invalid storage key: {key!r}')
+        return path
+
+    def save(self, key, fileobj):
+        """Write ``fileobj`` to ``key`` atomically; readers never see a partial file."""
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+                out.flush()
+                os.fsync(out.fileno())
+            # mkstemp creates the file owner-only; uploads are served publicly.
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def modified(self, key):
+        """Timestamp of the last save or touch of ``key``, or None if it does not exist."""
+        try:
+            return os.stat(self._path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def touch(self, key):
+        """Mark ``key`` as just used; returns False if it does not exist."""
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix):
+        """Yield ``(key, modified timestamp)`` for every file under ``prefix``."""
+        top = self._path(prefix)
+        for folder, _, filenames in os.walk(top):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue  # a save in progress
+                path = os.path.join(folder, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                try:
+                    yield key, os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+
+    def send(self, key):
+        try:
+            path = self._path(key)
+        except ValueError:
+            abort(404)
+        if self.accel_prefix:
+            if not os.path.isfile(path):
+                abort(404)
+            response = Response(mimetype=_content_type(key))
+            response.headers['X-Accel-Redirect'] = f"{self.accel_prefix.rstrip('/')}/{key}"
+            return response
+        # Honours USE_X_SENDFILE; otherwise gunicorn sends the file with sendfile(2).
+        return send_from_directory(self.root, key)
+
+
+class S3Storage:
+    """Objects in a bucket on S3 or an S3-compatible service (MinIO, R2, ...).
+
+    Credentials come from the usual boto3 sources (``AWS_ACCESS_KEY_ID`` /
+    ``AWS_SECRET_ACCESS_KEY``, an instance role, ...).
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, url_expiry=3600):
+        if boto3 is None:
+            raise RuntimeError('STORAGE_BACKEND=s3 needs boto3 (pip install boto3)')
+        if not bucket:
+            raise RuntimeError('STORAGE_BACKEND=s3 needs STORAGE_S3_BUCKET')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expiry = url_expiry
+
+    def _object_args(self, key):
+        return {'ContentType': _content_type(key), 'CacheControl': _cache_control(key)}
+
+    def save(self, key, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self.prefix + key, ExtraArgs=self._object_args(key))
+
+    def open(self, key):
+        # Uploads are at most MAX_CONTENT_LENGTH, and Pillow wants a seekable file.
+        body = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+        with body:
+            return io.BytesIO(body.read())
+
+    def exists(self, key):
+        return self.modified(key) is not None
+
+    def modified(self, key):
+        """Timestamp of the last save or touch of ``key``, or None if it does not exist."""
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head['LastModified'].timestamp()
+
+    def touch(self, key):
+        """Mark ``key`` as just used; returns False if it does not exist."""
+        # Objects are immutable; copying one onto itself is what resets LastModified.
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=self.prefix + key, MetadataDirective='REPLACE',
+                                    CopySource={'Bucket': self.bucket, 'Key': self.prefix + key},
+                                    **self._object_args(key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def list(self, prefix):
+        """Yield ``(key, modified timestamp)`` for every object under ``prefix``."""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for item in page.get('Contents', ()):
+                yield item['Key'][len(self.prefix):], item['LastModified'].timestamp()
+
+    def send(self, key):
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.prefix + key}, ExpiresIn=self.url_expiry,
+        )
+        response = redirect(url)
+        # The target expires, so the redirect itself must not be cached for long.
+        response.headers['Cache-Control'] = f'private, max-age={self.url_expiry // 2}'
+        return response
+
+
+def _create(flask_app):
+    config = flask_app.config
+    backend = config['STORAGE_BACKEND']
+    if backend == 'local':
+        return LocalStorage(config['STORAGE_LOCAL_ROOT'] or flask_app.static_folder,
+                            accel_prefix=config['STORAGE_ACCEL_PREFIX'])
+    if backend == 's3':
+        return S3Storage(config['STORAGE_S3_BUCKET'], prefix=config['STORAGE_S3_PREFIX'],
+                         endpoint_url=config['STORAGE_S3_ENDPOINT'], region=config['STORAGE_S3_REGION'],
+                         url_expiry=config['STORAGE_URL_EXPIRY'])
+    raise RuntimeError(f'unknown STORAGE_BACKEND {backend!r}')
+
+
+def get_storage():
+    """Return the storage backend of the current app, creating it on first use."""
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        storage = current_app.extensions['storage'] = _create(current_app)
+    return storage
+
+
+def send_upload(key):
+    """Response for ``/media/<key>``; only keys under ``uploads/`` are served."""
+    if not key.startswith(UPLOAD_PREFIX):
+        abort(404)
+    return get_storage().send(key)
+
+
+@bp.app_template_global()
+def upload_url(key):
+    """URL of the stored upload ``key``, on the CDN when one is configured."""
+    public_url = current_app.config['STORAGE_PUBLIC_URL']
+    if public_url:
+        return f"{public_url.rstrip('/')}/{key}"
+    return url_for('public.media', key=key)
@@ -0,0 +1,37 @@
+"""Template precompilation.
+
+Outside debug mode templates are compiled once per process and their
+bytecode is kept in ``JINJA_CACHE_DIR`` (``instance/jinja_cache`` by
+default), which every worker shares: the first worker after a deploy pays
+for parsing and code generation, the rest just unmarshal the bytecode.
+Jinja stores a checksum of the source with each entry, so an edited
+template is recompiled rather than served stale.
+
+``warm_templates`` loads every template at boot so the first visitor to a
+page does not wait for it to compile.
+"""
+import logging
+import time
+
+from flask import Blueprint, current_app
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('templating', __name__, cli_group=None)
+
+
+def warm_templates():
+    """Compile (or load from the bytecode cache) every template; return the count."""
+    started = time.perf_counter()
+    env = current_app.jinja_env
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    logger.info("Loaded %d templates in %.0f ms", len(names), (time.perf_counter() - started) * 1000)
+    return len(names)
+
+
+@bp.cli.command('warm-templates')
+def warm_templates_command():
+    """Precompile all templates into the bytecode cache."""
+    print(f"Compiled {warm_templates()} template(s).")
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import cache
+
+TEST_POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build the app against ``database_url`` (a fresh SQLite file by default)."""
+    def make(database_url=None, **config):
+        monkeypatch.setenv('DATABASE_URL', database_url or f"sqlite:///{tmp_path / 'test.db'}")
+        monkeypatch.setenv('INSTANCE_PATH', str(tmp_path / 'instance'))
+        monkeypatch.setenv('SESSION_SECRET', 'test')
+        from app import create_app
+        cache.clear()
+        # The contact flusher outlives its app; keep it from flushing into later tests.
+        return create_app({'TEMPLATE_WARMUP': False, 'CONTACT_FLUSH_INTERVAL': 3600, **config})
+    return make
+
+
+@pytest.fixture(params=[
+    pytest.param(None, id='sqlite'),
+    pytest.param(TEST_POSTGRES_URL, id='postgresql', marks=pytest.mark.skipif(
+        not TEST_POSTGRES_URL, reason='TEST_POSTGRES_URL is not set')),
+])
+def database_url(request):
+    """Each backend in turn: a fresh SQLite file, then ``TEST_POSTGRES_URL``.
+
+    The PostgreSQL database must be a scratch one; tests drop its tables.
+    """
+    return request.param
@@ -0,0 +1,75 @@
+"""Public GETs stay pure reads under concurrent first traffic."""
+import threading
+
+from sqlalchemy import event, func
+
+import cache
+from app import db
+from bootstrap import DEFAULT_CONTENT, DEFAULT_SERVICES, bootstrap_database
+from models import Admin, Content, Service, SiteSettings
+
+THREADS = 16
+REQUESTS_PER_THREAD = 25
+
+
+def run_threads(target, count):
+    errors = []
+
+    def wrapper():
+        try:
+            target()
+        except Exception as e:  # collected and asserted on below
+            errors.append(e)
+
+    threads = [threading.Thread(target=wrapper) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_concurrent_bootstrap_seeds_once(make_app):
+    app = make_app()
+
+    def bootstrap():
+        with app.app_context():
+            bootstrap_database()
+
+    assert run_threads(bootstrap, 8) == []
+    with app.app_context():
+        assert db.session.scalar(db.select(func.count(Admin.id))) == 1
+        assert db.session.scalar(db.select(func.count(SiteSettings.id))) == 1
+        assert sorted(db.session.execute(db.select(Content.section)).scalars()) == sorted(DEFAULT_CONTENT)
+        titles = db.session.execute(db.select(Service.category, Service.title)).all()
+        assert len(titles) == len(set(titles)) == sum(map(len, DEFAULT_SERVICES.values()))
+
+
+def test_services_hammered_on_cold_cache_only_reads(make_app):
+    app = make_app()
+    with app.app_context():
+        bootstrap_database()
+        writes = []
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def record_writes(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'ALTER'):
+                writes.append(statement)
+
+    cache.clear()
+    statuses = []
+
+    def hammer():
+        client = app.test_client()
+        for _ in range(REQUESTS_PER_THREAD):
+            response = client.get('/services')
+            statuses.append(response.status_code)
+            assert b'database is locked' not in response.data
+
+    assert run_threads(hammer, THREADS) == []
+    assert statuses == [200] * THREADS * REQUESTS_PER_THREAD
+    assert writes == []
+    with app.app_context():
+        titles = db.session.execute(db.select(Service.category, Service.title)).all()
+        assert len(titles) == len(set(titles)) == sum(map(len, DEFAULT_SERVICES.values()))
+        assert db.session.scalar(db.select(func.count(SiteSettings.id))) == 1
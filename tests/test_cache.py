@@ -0,0 +1,65 @@
+import pytest
+
+import cache
+from app import db
+from bootstrap import bootstrap_database
+from models import Service
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.drop_all()
+        bootstrap_database()
+    return app
+
+
+def test_matching_weak_etag_gets_304(app):
+    client = app.test_client()
+    first = client.get('/about', headers=GZIP)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].startswith('W/')
+    assert {'Cookie', 'Accept-Encoding'} <= {item.strip() for item in first.headers['Vary'].split(',')}
+
+    second = client.get('/about', headers={**GZIP, 'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert 'Accept-Encoding' in second.headers['Vary']
+
+
+def test_bump_renders_the_page_again(app):
+    client = app.test_client()
+    etag = client.get('/services').headers['ETag']
+    with app.app_context():
+        service = db.session.scalar(db.select(Service).filter_by(is_active=True).limit(1))
+        service.title = 'Walnut Bookshelf'
+        db.session.commit()
+
+    # Until the namespace is bumped the stored copy is still served.
+    assert client.get('/services', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.test_request_context():
+        cache.bump('services')
+    response = client.get('/services', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert b'Walnut Bookshelf' in response.data
+    assert response.headers['ETag'] != etag
+
+
+def test_logged_in_admin_is_not_cached(app):
+    admin = app.test_client()
+    admin.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+
+    # The login flash is still pending, so the public page renders for this session alone.
+    assert b'Login successful!' in admin.get('/').data
+    assert '/' not in cache._pages
+    assert b'Login successful!' not in app.test_client().get('/').data
+
+    response = admin.get('/admin')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-store'
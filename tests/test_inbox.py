@@ -0,0 +1,40 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import inbox
+
+
+def exported(**fields):
+    row = {'id': 1, 'name': 'Ravi', 'phone': '98765', 'service_interest': 'Kitchen', 'message': 'Hello',
+           'is_read': False, 'created_at': datetime(2026, 1, 1), **fields}
+    text = ''.join(inbox.export_csv([tuple(row[column] for column in inbox.EXPORT_COLUMNS)]))
+    return list(csv.DictReader(io.StringIO(text)))[0]
+
+
+@pytest.mark.parametrize('phone', ['+91 98765 43210', '-5551234', '+1 (555) 010-0100'])
+def test_export_keeps_phone_numbers(phone):
+    assert exported(phone=phone)['phone'] == phone
+
+
+@pytest.mark.parametrize('field, value', [
+    ('message', '=HYPERLINK("http://example.com","Click")'),
+    ('name', '+SUM(1,2)'),
+    ('service_interest', '-2+3*cmd|"/c calc"!A1'),
+    ('phone', '@SUM(1)'),
+])
+def test_export_escapes_formulas(field, value):
+    assert exported(**{field: value})[field] == "'" + value
+
+
+@pytest.mark.parametrize('form', [{}, {'older_than_days': '0'}, {'older_than_days': '-3'}, {'message_ids': ['x']}])
+def test_bulk_condition_never_selects_everything(form):
+    with pytest.raises(inbox.EmptySelection):
+        inbox.bulk_condition(MultiDict(form))
+
+
+def test_bulk_condition_accepts_a_one_day_cut_off():
+    assert inbox.bulk_condition(MultiDict({'older_than_days': '1'})) is not None
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+import ingest
+from app import db
+from bootstrap import bootstrap_database
+from models import ContactMessage
+
+
+def test_first_request_delivers_rows_staged_before_restart(make_app, monkeypatch):
+    # A fresh worker: no queue or flusher left over from other tests' apps.
+    monkeypatch.setattr(ingest, '_queue', None)
+    monkeypatch.setattr(ingest, '_flusher', None)
+    app = make_app(CONTACT_FLUSH_INTERVAL=0.05)
+    with app.app_context():
+        bootstrap_database()
+        # Staged by a previous process that stopped before flushing.
+        ingest._setup()
+        ingest._queue.put({'name': 'Ravi', 'phone': '98765', 'service_interest': 'Wardrobe',
+                           'message': 'Call me', 'created_at': '2026-01-01T10:00:00'})
+
+    assert app.test_client().get('/').status_code == 200
+    deadline = time.monotonic() + 5
+    with app.app_context():
+        while not db.session.scalar(db.select(db.func.count()).select_from(ContactMessage)):
+            assert time.monotonic() < deadline, 'staged message was never flushed'
+            time.sleep(0.05)
+            db.session.remove()
+
+    # Park the flusher (it cannot be stopped) so it stays out of later tests.
+    app.config['CONTACT_FLUSH_INTERVAL'] = 3600
+    ingest._flusher.join(0.5)
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    # Fresh buckets and queue; make_app keeps the flusher asleep.
+    monkeypatch.setattr(ingest, '_queue', None)
+    monkeypatch.setattr(ingest, '_flusher', None)
+    app = make_app(CONTACT_RATE_BURST=2, CONTACT_RATE_PER_MINUTE=0)
+    with app.app_context():
+        bootstrap_database()
+    return app
+
+
+def submit(client, phone='+91 98765 43210', ip='203.0.113.7', **headers):
+    return client.post('/contact', environ_base={'REMOTE_ADDR': ip}, headers=headers, data={
+        'name': 'Ravi', 'phone': phone, 'service_interest': 'Wardrobe', 'message': 'Call me',
+    })
+
+
+def inbox_count():
+    return db.session.scalar(db.select(db.func.count()).select_from(ContactMessage))
+
+
+def test_client_is_rejected_once_its_bucket_is_empty(app):
+    client = app.test_client()
+    statuses = [submit(client, phone=f'98765 4321{i}').status_code for i in range(3)]
+    assert statuses == [302, 302, 429]
+
+    # X-Forwarded-For is not trusted without PROXY_X_FOR.
+    assert submit(client, phone='98765 00000', **{'X-Forwarded-For': '198.51.100.1'}).status_code == 429
+
+
+def test_phone_is_rejected_once_its_bucket_is_empty(app):
+    client = app.test_client()
+    statuses = [submit(client, ip=f'203.0.113.{i}').status_code for i in range(3)]
+    assert statuses == [302, 302, 429]
+
+
+def test_phone_without_digits_is_limited_by_client(app):
+    client = app.test_client()
+    statuses = [submit(client, phone='( )', ip=f'203.0.113.{i}').status_code for i in range(3)]
+    assert statuses == [302, 302, 302]
+
+
+def test_staged_submission_waits_for_flush(app):
+    assert submit(app.test_client()).status_code == 302
+    with app.app_context():
+        assert inbox_count() == 0
+
+    # A restarted worker opens the same staging file.
+    ingest._queue = None
+    with app.app_context():
+        assert ingest.flush() == 1
+        message = db.session.scalar(db.select(ContactMessage))
+        assert (message.name, message.phone, message.message) == ('Ravi', '+91 98765 43210', 'Call me')
+        assert ingest.flush() == 0
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(metrics, '_stats', {})
+    return make_app(PROPAGATE_EXCEPTIONS=True)
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def requests_total(stats, endpoint):
+    return sum(stats.get(endpoint, {}).get('statuses', {}).values())
+
+
+def test_exited_workers_still_count(app):
+    with app.test_request_context():
+        directory = metrics._metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    worker = metrics._new_stats()
+    worker.update(count=7, statuses={'200': 7})
+    with open(os.path.join(directory, f'{dead_pid()}.json'), 'w') as out:
+        json.dump({'stats': {'public.index': worker}, 'slow': []}, out)
+
+    with app.test_request_context():
+        first, _ = metrics.snapshot()
+        second, _ = metrics.snapshot()
+
+    assert requests_total(first, 'public.index') == requests_total(second, 'public.index') == 7
+    assert sorted(name for name in os.listdir(directory) if name.endswith('.json')) == \
+        sorted([f'{os.getpid()}.json', metrics.RETIRED])
+
+
+def test_unhandled_exceptions_count_as_500(app):
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/boom')
+
+    assert metrics._stats['boom']['statuses'] == {'500': 1}
@@ -0,0 +1,175 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import ordering
+from app import db
+from bootstrap import bootstrap_database
+from models import Service
+
+CATEGORY = 'test'
+
+
+@pytest.fixture
+def app(make_app, database_url):
+    app = make_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        bootstrap_database()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def make_services(*keys):
+    """Services in ``CATEGORY`` with the given order keys; returns their ids."""
+    services = [Service(title=f'Service {i}', description='d', category=CATEGORY, order_index=key)
+                for i, key in enumerate(keys)]
+    db.session.add_all(services)
+    db.session.commit()
+    return [service.id for service in services]
+
+
+def keys(ids):
+    rows = dict(db.session.execute(db.select(Service.id, Service.order_index).where(Service.id.in_(ids))).all())
+    return [rows[service_id] for service_id in ids]
+
+
+def ordered_ids():
+    return db.session.execute(
+        db.select(Service.id).where(Service.category == CATEGORY).order_by(Service.order_index)
+    ).scalars().all()
+
+
+def login(client):
+    client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+def test_move_into_a_gap_rewrites_one_row(app):
+    a, b, c, d = make_services(1024, 2048, 3072, 4096)
+
+    assert ordering.reorder(CATEGORY, [a, d, b, c]) == 1
+    db.session.commit()
+
+    assert ordered_ids() == [a, d, b, c]
+    assert keys([a, d, b, c]) == [1024, 1536, 2048, 3072]
+
+
+def test_exhausted_gap_renumbers_the_category(app):
+    a, b, c = make_services(1, 2, 3)
+
+    assert ordering.reorder(CATEGORY, [a, c, b]) == 3
+    db.session.commit()
+
+    assert keys([a, c, b]) == [1024, 2048, 3072]
+
+
+def test_rows_can_swap_keys(app):
+    a, b = make_services(1024, 2048)
+
+    # Checked row by row, the first update would collide with the other row.
+    ordering._write({a: 2048, b: 1024})
+    db.session.commit()
+
+    assert keys([a, b]) == [2048, 1024]
+
+
+def test_unchanged_order_writes_nothing(app):
+    ids = make_services(1024, 2048, 3072)
+
+    assert ordering.reorder(CATEGORY, ids) == 0
+
+
+def test_respace_all_fixes_shared_and_missing_keys(app):
+    # Databases from before the unique index.
+    db.session.execute(text('DROP INDEX uq_service_category_order'))
+    db.session.commit()
+    a, b, c, d = make_services(1024, 1024, None, 2048)
+
+    assert ordering.respace_all() == 3
+    db.session.commit()
+
+    assert ordered_ids() == [a, b, d, c]
+    assert keys([a, b, d, c]) == [1024, 2048, 3072, 4096]
+
+
+@pytest.mark.parametrize('ids, status', [
+    (lambda ids: ids[:-1], 409),              # a service was added since the page loaded
+    (lambda ids: ids + [ids[0]], 400),        # duplicate id
+    (lambda ids: ids[:-1] + ['x'], 400),      # not an id
+])
+def test_reorder_api_rejects_bad_id_lists(app, ids, status):
+    original = make_services(1024, 2048, 3072)
+    client = login(app.test_client())
+
+    response = client.post('/admin/api/services/reorder', json={'category': CATEGORY, 'ids': ids(original)})
+
+    assert response.status_code == status
+    assert keys(original) == [1024, 2048, 3072]
+
+
+def test_reorder_api_reports_a_concurrent_add_as_stale(app, monkeypatch):
+    a, b, c = make_services(1024, 2048, 3072)
+    client = login(app.test_client())
+
+    def reorder_into_taken_key(category, ids):
+        # The key written here is already taken, as when a concurrent add lands on it.
+        db.session.get(Service, c).order_index = 1024
+        return 1
+    monkeypatch.setattr(ordering, 'reorder', reorder_into_taken_key)
+
+    response = client.post('/admin/api/services/reorder', json={'category': CATEGORY, 'ids': [a, c, b]})
+
+    assert response.status_code == 409
+    assert keys([a, b, c]) == [1024, 2048, 3072]
+
+
+def taken_key(category):
+    return db.session.scalar(db.select(db.func.max(Service.order_index)).where(Service.category == category))
+
+
+def add(category, title='Shoe Rack'):
+    service = Service(title=title, description='Fitted shoe rack', category=category)
+    ordering.place_last(service)
+    db.session.add(service)
+    return service
+
+
+def test_commit_placed_retries_a_key_taken_by_a_concurrent_add(app, monkeypatch):
+    category = db.session.scalar(db.select(Service.category).limit(1))
+    last = taken_key(category)
+    # The key a racing add committed between computing it and inserting.
+    taken = iter([last])
+    real = ordering.next_order_index
+    monkeypatch.setattr(ordering, 'next_order_index', lambda c: next(taken, None) or real(c))
+
+    service = ordering.commit_placed(lambda: add(category))
+
+    assert service.order_index == last + ordering.ORDER_GAP
+    assert db.session.scalar(db.select(db.func.count()).where(Service.title == 'Shoe Rack')) == 1
+
+
+def test_commit_placed_gives_up_after_one_retry(app, monkeypatch):
+    category = db.session.scalar(db.select(Service.category).limit(1))
+    last = taken_key(category)
+    monkeypatch.setattr(ordering, 'next_order_index', lambda c: last)
+
+    with pytest.raises(ordering.OrderConflict):
+        ordering.commit_placed(lambda: add(category))
+
+    assert taken_key(category) == last
+    assert not db.session.scalar(db.select(db.func.count()).where(Service.title == 'Shoe Rack'))
+
+
+def test_commit_placed_does_not_retry_other_integrity_errors(app):
+    category = db.session.scalar(db.select(Service.category).limit(1))
+    calls = []
+
+    def add_untitled():
+        calls.append(1)
+        return add(category, title=None)
+
+    with pytest.raises(IntegrityError):
+        ordering.commit_placed(add_untitled)
+    assert len(calls) == 1
@@ -0,0 +1,68 @@
+"""Message and service search on every backend."""
+import pytest
+
+import search
+from app import db
+from bootstrap import bootstrap_database
+from models import ContactMessage
+
+
+@pytest.fixture
+def app(make_app, database_url):
+    app = make_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        bootstrap_database()
+        db.session.add_all([
+            ContactMessage(name='Ravi Kumar', phone='+91 9876543210', service_interest='Bedroom Wardrobe Installation',
+                           message='Need two wardrobes installed in the bedrooms next week', is_read=True),
+            ContactMessage(name='Anita', phone='555 0100', service_interest='Modular Kitchen',
+                           message='Kitchen cabinets installation quote please', is_read=False),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.parametrize('query, names', [
+    ('wardrobes', ['Ravi Kumar']),
+    ('bedrooms', ['Ravi Kumar']),
+    ('kitchen cabinets', ['Anita']),
+    ('the wardrobes', ['Ravi Kumar']),
+    ('ravi', ['Ravi Kumar']),
+    ('98765', ['Ravi Kumar']),
+    ('instal', ['Anita', 'Ravi Kumar']),
+    ('sofa', []),
+])
+def test_search_messages(app, query, names):
+    assert sorted(message.name for message in search.search_messages(query)) == names
+
+
+def test_search_messages_with_filters(app):
+    assert [m.name for m in search.search_messages('installation', [ContactMessage.is_read.is_(False)])] == ['Anita']
+
+
+@pytest.mark.parametrize('query, title', [
+    ('wardrobe', 'Wardrobe Installation'),
+    ('modular kitchen', 'Modular Kitchen Installation'),
+    ('workstation', 'Office Workstation Installation'),
+])
+def test_search_services(app, query, title):
+    assert title in [service.title for service in search.search_services(query)]
+
+
+def test_filters_apply_before_the_candidate_limit(app):
+    # The unread matches are all older than the newest MESSAGE_CANDIDATES matches.
+    unread, read = 500, search.MESSAGE_CANDIDATES + 100
+    db.session.execute(db.insert(ContactMessage), [
+        {'name': f'Customer {i}', 'phone': '555 0100', 'service_interest': 'Modular Kitchen',
+         'message': 'Kitchen quote please', 'is_read': i >= unread}
+        for i in range(unread + read)
+    ])
+    db.session.commit()
+
+    results = search.search_messages('kitchen', [ContactMessage.is_read.is_(False)], limit=1000)
+
+    assert len(results) == unread + 1  # and Anita's
+    assert not any(message.is_read for message in results)
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from app import db
+from bootstrap import bootstrap_database
+
+TEST_REDIS_URL = os.environ.get('TEST_REDIS_URL')
+
+
+@pytest.fixture(params=[
+    pytest.param({'SESSION_BACKEND': 'memory'}, id='memory'),
+    pytest.param({'SESSION_BACKEND': 'cookie'}, id='cookie'),
+    pytest.param({'SESSION_BACKEND': 'redis', 'SESSION_REDIS_URL': TEST_REDIS_URL}, id='redis',
+                 marks=pytest.mark.skipif(not TEST_REDIS_URL, reason='TEST_REDIS_URL is not set')),
+])
+def app(make_app, request):
+    app = make_app(CACHE_VERSION_CHECK_INTERVAL=0, **request.param)
+    with app.app_context():
+        db.drop_all()
+        bootstrap_database()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def login(app):
+    client = app.test_client()
+    response = client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.headers['Location'].endswith('/admin')
+    return client
+
+
+def signed_in(client):
+    return client.get('/admin').status_code == 200
+
+
+def change_password(client, new_password='new-secret'):
+    return client.post('/admin/change-password', data={
+        'current_password': 'admin123', 'new_password': new_password, 'confirm_password': new_password,
+    })
+
+
+def test_password_change_logs_out_older_sessions(app):
+    other, current = login(app), login(app)
+    assert signed_in(other) and signed_in(current)
+
+    response = change_password(current)
+
+    assert response.headers['Location'].endswith('/admin')
+    assert not signed_in(other)
+    assert signed_in(current)
+
+
+def test_new_password_signs_in_again(app):
+    change_password(login(app))
+
+    client = app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'new-secret'})
+
+    assert signed_in(client)
@@ -0,0 +1,107 @@
+import io
+import os
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import uploads
+from bootstrap import bootstrap_database
+from storage import get_storage
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:  # pragma: no cover - moto is optional
+    mock_aws = None
+
+BUCKET = 'media-bucket'
+
+
+def upload(data=b'photo bytes'):
+    return uploads.save_upload(FileStorage(io.BytesIO(data), filename='photo.jpg'), max_size=1024)
+
+
+def age(storage, key, seconds):
+    path = storage._path(key)
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_release_keeps_recent_and_deletes_old_orphans(make_app, tmp_path):
+    app = make_app(STORAGE_LOCAL_ROOT=str(tmp_path / 'media'), UPLOAD_GC_MIN_AGE=60)
+    with app.app_context():
+        bootstrap_database()
+        storage = get_storage()
+        key = upload()
+
+        uploads.release([key])
+        assert storage.exists(key)
+
+        age(storage, key, 120)
+        uploads.release([key])
+        assert not storage.exists(key)
+
+
+def test_duplicate_upload_refreshes_modified_time(make_app, tmp_path):
+    app = make_app(STORAGE_LOCAL_ROOT=str(tmp_path / 'media'), UPLOAD_GC_MIN_AGE=60)
+    with app.app_context():
+        bootstrap_database()
+        storage = get_storage()
+        key = upload()
+        age(storage, key, 120)
+
+        # The same bytes again, as a request that has not committed its reference yet.
+        assert upload() == key
+        uploads.release([key])
+        assert storage.exists(key)
+        assert uploads.collect_garbage(min_age=60) == []
+
+
+@pytest.fixture
+def s3_app(make_app, monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        app = make_app(STORAGE_BACKEND='s3', STORAGE_S3_BUCKET=BUCKET, STORAGE_S3_PREFIX='site/',
+                       STORAGE_S3_REGION='us-east-1', UPLOAD_GC_MIN_AGE=60)
+        with app.app_context():
+            bootstrap_database()
+            yield app
+
+
+@pytest.mark.skipif(mock_aws is None, reason='moto is not installed')
+def test_s3_storage_round_trip(s3_app):
+    storage = get_storage()
+    key = upload()
+
+    assert storage.exists(key)
+    assert storage.open(key).read() == b'photo bytes'
+    assert [listed for listed, _ in storage.list('uploads/')] == [key]
+    assert storage.modified('uploads/missing.jpg') is None
+    assert storage.touch('uploads/missing.jpg') is False
+
+    storage.delete(key)
+    assert not storage.exists(key)
+
+
+@pytest.mark.skipif(mock_aws is None, reason='moto is not installed')
+def test_s3_touch_refreshes_modified_and_keeps_metadata(s3_app):
+    storage = get_storage()
+    key = upload()
+    saved = storage.modified(key)
+    # LastModified has one-second resolution.
+    time.sleep(1.1)
+
+    assert storage.touch(key) is True
+    assert storage.modified(key) > saved
+    head = storage.client.head_object(Bucket=BUCKET, Key='site/' + key)
+    assert head['ContentType'] == 'image/jpeg'
+
+    uploads.release([key])
+    assert storage.exists(key)
+
+    s3_app.config['UPLOAD_GC_MIN_AGE'] = 0
+    uploads.release([key])
+    assert not storage.exists(key)
@@ -0,0 +1,198 @@
+"""Streaming, content-addressed uploads and their garbage collection.
+
+An upload is read exactly once: each chunk is size-checked, hashed and
+spooled to a temporary file, which is then handed to the storage backend.
+Files are named after their SHA-256 digest, so uploading the same photo
+twice reuses the stored file instead of keeping a copy; the reuse touches
+the file, so it counts as freshly uploaded.
+
+Because files are shared, replacing or deleting an image cannot simply
+delete its file. ``release`` deletes the given keys once no row refers to
+them any more and they have not been uploaded for ``UPLOAD_GC_MIN_AGE``
+seconds (another request may be about to commit a reference), and
+``flask --app main gc-uploads`` sweeps everything else that is
+unreferenced: files left by failed requests, superseded image variants,
+and old uploads from before content addressing. That command
+first moves referenced legacy files (``1000117889_1751955193.jpg``) to
+their digest name, so byte-identical copies collapse into one file.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+import click
+from flask import Blueprint, current_app
+
+import cache
+from app import db
+from middleware import DIGEST_NAME
+from models import Service, SiteSettings
+from storage import UPLOAD_PREFIX, get_storage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+
+bp = Blueprint('uploads', __name__, cli_group=None)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _digest_key(digest, extension):
+    return f'{UPLOAD_PREFIX}{digest.hexdigest()[:32]}{extension}'
+
+
+def save_upload(file, max_size):
+    """Store a werkzeug ``FileStorage`` and return its storage key.
+
+    Raises ``UploadTooLarge`` as soon as more than ``max_size`` bytes have
+    been read; nothing is stored in that case.
+    """
+    extension = os.path.splitext(file.filename)[1].lower()
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+        while True:
+            chunk = file.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(size)
+            digest.update(chunk)
+            spool.write(chunk)
+
+        key = _digest_key(digest, extension)
+        storage = get_storage()
+        # Touching an existing file keeps release() and gc-uploads from
+        # deleting it before this request commits its reference.
+        if not storage.touch(key):
+            spool.seek(0)
+            storage.save(key, spool)
+    return key
+
+
+def variant_keys(variants):
+    """Every key referenced by an ``image_variants`` description."""
+    if not variants:
+        return set()
+    keys = {path for sources in variants.get('sources', {}).values() for _, path in sources}
+    keys.update(filter(None, (variants.get('fallback'), variants.get('thumbnail'))))
+    return keys
+
+
+def service_keys(service):
+    """The keys of ``service``'s image and its variants."""
+    return {service.image_path, *variant_keys(service.image_variants)} - {None}
+
+
+def referenced_keys():
+    """Every upload key some row still refers to."""
+    keys = set(db.session.execute(db.select(SiteSettings.logo_path)).scalars()) - {None}
+    for image_path, variants in db.session.execute(db.select(Service.image_path, Service.image_variants)):
+        keys.add(image_path)
+        keys.update(variant_keys(variants))
+    keys.discard(None)
+    return keys
+
+
+def release(keys):
+    """Delete whichever of ``keys`` no row refers to any more.
+
+    Call it after committing the change that dropped the references. Keys
+    saved or touched within ``UPLOAD_GC_MIN_AGE`` seconds are kept, as
+    ``collect_garbage`` keeps them: a concurrent request may have just
+    uploaded the same bytes and not committed yet. Failing to delete only
+    leaves work for ``gc-uploads``, so errors are logged rather than raised.
+    """
+    try:
+        orphaned = {key for key in keys if key and key.startswith(UPLOAD_PREFIX)} - referenced_keys()
+        storage = get_storage()
+        cutoff = time.time() - current_app.config['UPLOAD_GC_MIN_AGE']
+        for key in orphaned:
+            modified = storage.modified(key)
+            if modified is not None and modified < cutoff:
+                storage.delete(key)
+    except Exception:
+        logger.exception("Could not delete released uploads %s", sorted(keys))
+
+
+def adopt_legacy_uploads():
+    """Rename referenced uploads that predate content addressing to their digest.
+
+    Byte-identical copies end up as one file; the old names become
+    unreferenced. Returns ``{old key: new key}``.
+    """
+    storage = get_storage()
+    legacy = {key for key in referenced_keys()
+              if key.startswith(UPLOAD_PREFIX) and '/variants/' not in key and not DIGEST_NAME.search('/' + key)}
+    renamed = {}
+    for key in sorted(legacy):
+        if not storage.exists(key):
+            logger.warning("Referenced upload %s is missing", key)
+            continue
+        digest = hashlib.sha256()
+        with storage.open(key) as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        new_key = _digest_key(digest, os.path.splitext(key)[1].lower())
+        if not storage.exists(new_key):
+            with storage.open(key) as source:
+                storage.save(new_key, source)
+
+        for service in Service.query.filter_by(image_path=key):
+            # Reuse the variants of an identical photo that was already moved.
+            shared = db.session.execute(
+                db.select(Service.image_variants)
+                .where(Service.image_path == new_key, Service.image_variants.isnot(None))
+                .limit(1)
+            ).scalar()
+            service.image_path = new_key
+            service.image_variants = shared or service.image_variants
+        SiteSettings.query.filter_by(logo_path=key).update({'logo_path': new_key})
+        db.session.commit()
+        renamed[key] = new_key
+
+    if renamed:
+        cache.bump('services')
+        cache.bump('settings')
+    return renamed
+
+
+def collect_garbage(min_age, dry_run=False):
+    """Delete stored uploads no row refers to and return their keys.
+
+    Files younger than ``min_age`` seconds are kept: they may belong to a
+    request that has not committed yet, or to variants still being written.
+    """
+    storage = get_storage()
+    referenced = referenced_keys()
+    cutoff = time.time() - min_age
+    garbage = [key for key, modified in storage.list(UPLOAD_PREFIX)
+               if key not in referenced and modified < cutoff]
+    if not dry_run:
+        for key in garbage:
+            storage.delete(key)
+    return garbage
+
+
+@bp.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='List what would be deleted without deleting it.')
+@click.option('--min-age', type=int, default=None,
+              help='Keep unreferenced files younger than this many seconds (default UPLOAD_GC_MIN_AGE).')
+def gc_uploads_command(dry_run, min_age):
+    """Delete uploaded files that nothing refers to."""
+    if min_age is None:
+        min_age = current_app.config['UPLOAD_GC_MIN_AGE']
+    if not dry_run:
+        for old_key, new_key in adopt_legacy_uploads().items():
+            print(f"Renamed {old_key} -> {new_key}")
+    garbage = collect_garbage(min_age, dry_run=dry_run)
+    for key in garbage:
+        print(f"{'Would delete' if dry_run else 'Deleted'} {key}")
+    print(f"{len(garbage)} unreferenced upload(s) {'found' if dry_run else 'deleted'}.")